@@ -0,0 +1,1223 @@
+"""
+Timing comparisons for the shopping assistant data structures, and a
+repeatable suite for catching regressions.
+
+    python benchmark.py                          # every comparison below
+    python benchmark.py bench_journal            # only the ones named
+    python benchmark.py --suite --json run.json  # the suite, saved as JSON
+    python benchmark.py --suite --compare run.json --cases LifoCart --sizes 10000
+
+The suite runs every case of CASES on every workload of WORKLOADS and size:
+warm-up runs first, then --repeat timed runs on a fresh structure each,
+reported as nanoseconds per operation (min, median, mean, standard
+deviation). Workloads come from a seeded generator, so two runs on the same
+machine time the same operations; --compare prints the median of each case
+against a saved run.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from itertools import islice
+
+from shopping_core.archive import HistoryArchive, load_numpy
+from shopping_core.cart import CartList, DoublyLinkedList, LifoCart
+from shopping_core.catalog import Catalog, CatalogFile
+from shopping_core.copurchase import CoPurchaseIndex
+from shopping_core.history import UndoRedoCart
+from shopping_core.journal import ADD, PROCESS, CartJournal
+from shopping_core.orders import (BlockingCircularQueue, CircularQueue, Order, OrderIntake, OrderStats,
+                                  OrderWorkerPool, PriorityOrderQueue)
+from shopping_core.priority_sort import (SORT_STRATEGIES, SortedProductList, insertion_sort, page, priority_band,
+                                         sort_by_priority, top_k)
+from shopping_core.search import SearchIndex
+from shopping_core.sessions import SessionCartStore
+from shopping_core.summary import CartSummary
+
+INSERTION_SORT_MAX = 10_000  # The original O(n^2) sort takes hours beyond this
+COUNTING_SORT_SPAN = 1024  # Widest priority span bench_priority_sort runs counting sort on, for small n
+
+
+class OriginalCircularQueue:
+    """
+    The topic3 queue before the count field and batch methods, kept as a baseline.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.queue = [None] * capacity
+        self.front = -1
+        self.rear = -1
+
+    def is_full(self):
+        return (self.rear + 1) % self.capacity == self.front
+
+    def is_empty(self):
+        return self.front == -1
+
+    def enqueue(self, item):
+        if self.is_full():
+            return False
+        if self.is_empty():
+            self.front = 0
+        self.rear = (self.rear + 1) % self.capacity
+        self.queue[self.rear] = item
+        return True
+
+    def dequeue(self):
+        if self.is_empty():
+            return None
+        item = self.queue[self.front]
+        self.queue[self.front] = None
+        if self.front == self.rear:
+            self.front = -1
+            self.rear = -1
+        else:
+            self.front = (self.front + 1) % self.capacity
+        return item
+
+
+class DequeLifoCart:
+    """
+    The topic5/topic6 cart before the persistent stack, kept as a baseline:
+    a snapshot is a copy of the deque.
+    """
+    def __init__(self):
+        self.items = deque()
+        self.history = []
+        self.summary = CartSummary()
+
+    def __len__(self):
+        return len(self.items)
+
+    def snapshot(self):
+        return self.items.copy()
+
+    def add(self, item):
+        self.items.append(item)
+        self.history.append(("Add", item))
+        self.summary.add(item)
+
+    def process(self):
+        if not self.items:
+            return None
+        item = self.items.pop()
+        self.history.append(("Process", item))
+        self.summary.remove(item)
+        return item
+
+
+def make_products(n, shape, seed=0):
+    """
+    Build n product dicts. shape is one of:
+    "random"        - priorities 1-10 in random order
+    "nearly sorted" - priorities 0..n with 1% of the items swapped
+    "wide"          - random priorities up to a billion
+    """
+    rng = random.Random(seed)
+    if shape == "random":
+        priorities = [rng.randint(1, 10) for _ in range(n)]
+    elif shape == "nearly sorted":
+        priorities = list(range(n))
+        for _ in range(n // 100):
+            a, b = rng.randrange(n), rng.randrange(n)
+            priorities[a], priorities[b] = priorities[b], priorities[a]
+    else:
+        priorities = [rng.randint(0, 10 ** 9) for _ in range(n)]
+    return [{"product": f"Item {i}", "priority": p} for i, p in enumerate(priorities)]
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_priority_sort(sizes=(1_000, 10_000, 100_000, 1_000_000)):
+    """
+    Each strategy of SORT_STRATEGIES, "builtin" (list.sort, what
+    sort_by_priority uses) first, against the original insertion sort.
+    Counting sort only runs where the priorities span at most
+    max(COUNTING_SORT_SPAN, n) values; it needs a bucket for each.
+    """
+    print("Priority sort (seconds)")
+    names = ["original"] + list(SORT_STRATEGIES)
+    print(f"{'shape':<14}{'n':>10}" + "".join(f"{name:>12}" for name in names))
+    for shape in ("random", "nearly sorted", "wide"):
+        for n in sizes:
+            products = make_products(n, shape)
+            row = []
+            for name in names:
+                if name in ("original", "insertion") and n > INSERTION_SORT_MAX:
+                    row.append("skipped")
+                    continue
+                priorities = [product["priority"] for product in products]
+                if name == "counting" and max(priorities) - min(priorities) >= max(COUNTING_SORT_SPAN, n):
+                    row.append("n/a")
+                    continue
+                if name == "original":
+                    seconds = time_call(insertion_sort, list(products))
+                else:
+                    seconds = time_call(sort_by_priority, list(products), name)
+                row.append(f"{seconds:.4f}")
+            print(f"{shape:<14}{n:>10}" + "".join(f"{cell:>12}" for cell in row))
+    print()
+
+
+def bench_first_page(n=1_000_000, limit=50):
+    """
+    Time to get the first page of products in priority order: sorting the
+    whole list against top_k, page and priority_band on a plain list, and
+    the same queries on a SortedProductList. Milliseconds.
+    """
+    print(f"First page of {limit} products out of {n} (milliseconds)")
+    print(f"{'shape':<14}{'full sort':>12}{'top_k':>12}{'page 2':>12}{'band':>12}{'kept sorted':>12}")
+    for shape in ("random", "wide"):
+        products = make_products(n, shape)
+        kept = SortedProductList(products)
+        band = (0, 10) if shape == "random" else (0, 10 ** 7)
+        cells = [
+            time_call(sort_by_priority, list(products)),
+            time_call(top_k, products, limit),
+            time_call(page, products, limit, limit),
+            time_call(priority_band, products, band[0], band[1], limit),
+            time_call(top_k, kept, limit),
+        ]
+        print(f"{shape:<14}" + "".join(f"{seconds * 1000:>12.2f}" for seconds in cells))
+    print("(the original insertion sort is O(n^2) and is not run at this size)")
+    print()
+
+
+def bench_list_rendering(sizes=(1_000, 100_000), updates=20):
+    """
+    Per-update latency of a full Listbox rebuild (what topic3/topic7 did)
+    against VirtualListbox diffs. Needs a display.
+    """
+    import tkinter as tk  # Only this benchmark needs Tk
+    from widgets import VirtualListbox
+
+    print("List rendering (milliseconds per update)")
+    try:
+        root = tk.Tk()
+    except tk.TclError as error:
+        print(f"skipped: {error}\n")
+        return
+    print(f"{'n':>10}{'rebuild':>12}{'append':>12}{'pop front':>12}{'refresh':>12}")
+    for n in sizes:
+        rows = [f"Item {i}" for i in range(n)]
+        plain = tk.Listbox(root)
+        virtual = VirtualListbox(root, lambda index: rows[index])
+        virtual.set_count(n)
+
+        def rebuild():
+            plain.delete(0, tk.END)
+            for row in rows:
+                plain.insert(tk.END, row)
+            root.update_idletasks()
+
+        def append():
+            rows.append("New item")
+            virtual.insert_rows(len(rows) - 1)
+            root.update_idletasks()
+
+        def pop_front():
+            rows.pop(0)
+            virtual.delete_rows(0)
+            root.update_idletasks()
+
+        def refresh():
+            virtual.set_count(len(rows))
+            root.update_idletasks()
+
+        cells = []
+        for func in (rebuild, append, pop_front, refresh):
+            seconds = sum(time_call(func) for _ in range(updates))
+            cells.append(f"{seconds / updates * 1000:.3f}")
+        print(f"{n:>10}" + "".join(f"{cell:>12}" for cell in cells))
+        plain.destroy()
+        virtual.destroy()
+    root.destroy()
+    print()
+
+
+def bench_cart_list(sizes=(10_000, 100_000, 1_000_000), operations=1_000):
+    """
+    topic4 cart operations on a plain list against CartList. Every item
+    name appears many times; the membership test looks for a missing item
+    and the removal rotates an item from the front of the cart to the back.
+    """
+    print(f"Cart membership and removal ({operations} operations, seconds)")
+    print(f"{'n':>10}{'list in':>12}{'cart in':>12}{'list remove':>14}{'cart remove':>14}")
+    for n in sizes:
+        names = [f"Item {i % (n // 100)}" for i in range(n)]
+        plain = list(names)
+        cart = CartList()
+        for name in names:
+            cart.append(name)
+
+        def membership(container):
+            for _ in range(operations):
+                "Missing item" in container
+
+        def rotate(container):
+            for i in range(operations):
+                name = names[i % len(names)]
+                container.remove(name)
+                container.append(name)
+
+        cells = [time_call(membership, plain), time_call(membership, cart),
+                 time_call(rotate, plain), time_call(rotate, cart)]
+        print(f"{n:>10}{cells[0]:>12.4f}{cells[1]:>12.4f}{cells[2]:>14.4f}{cells[3]:>14.4f}")
+    print()
+
+
+def measure_memory(build):
+    """
+    Return (bytes kept, peak bytes) allocated while running build().
+    """
+    tracemalloc.start()
+    result = build()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return kept, peak
+
+
+def bench_cart_memory(sizes=(1_000, 100_000), quantity=3):
+    """
+    Memory per distinct item for the old dict-of-counts cart and the topic2
+    DoublyLinkedList, each rendering the cart text once. The linked list
+    keeps a node and a CartSummary entry per item on top of its dict, so
+    it keeps three to four times the memory of the dict of counts.
+    """
+    print("Cart memory (bytes per distinct item: kept / peak)")
+    print(f"{'n':>10}{'dict of counts':>22}{'linked list':>22}")
+    for n in sizes:
+        names = [f"Item {i}" for i in range(n)] * quantity
+
+        def build_dict():
+            items = {}
+            for name in names:
+                items[name] = items.get(name, 0) + 1
+            text = ", ".join([f"{item} x{count}" for item, count in items.items()])
+            return items, text
+
+        def build_list():
+            cart = DoublyLinkedList()
+            for name in names:
+                cart.add(name)
+            text = str(cart)
+            return cart, text
+
+        cells = []
+        for build in (build_dict, build_list):
+            kept, peak = measure_memory(build)
+            cells.append(f"{kept // n} / {peak // n}")
+        print(f"{n:>10}{cells[0]:>22}{cells[1]:>22}")
+    print()
+
+
+def bench_circular_queue(sizes=(10_000, 1_000_000), batch=100):
+    """
+    Enqueue then dequeue n items; reported in million items per second.
+    """
+    print("Order queue throughput (million items/s)")
+    names = ["original", "ring", "ring growable", "ring batched", "deque"]
+    print(f"{'n':>10}" + "".join(f"{name:>16}" for name in names))
+    for n in sizes:
+        items = list(range(n))
+
+        def original():
+            queue = OriginalCircularQueue(n)
+            for item in items:
+                queue.enqueue(item)
+            while queue.dequeue() is not None:
+                pass
+
+        def ring(queue):
+            for item in items:
+                queue.enqueue(item)
+            while queue.count:
+                queue.dequeue()
+
+        def ring_batched():
+            queue = CircularQueue(batch, growable=True)
+            for start in range(0, n, batch):
+                queue.enqueue_many(items[start:start + batch])
+            while queue.count:
+                queue.dequeue_many(batch)
+
+        def plain_deque():
+            queue = deque()
+            for item in items:
+                queue.append(item)
+            while queue:
+                queue.popleft()
+
+        seconds = [time_call(original), time_call(ring, CircularQueue(n)),
+                   time_call(ring, CircularQueue(16, growable=True)),
+                   time_call(ring_batched), time_call(plain_deque)]
+        print(f"{n:>10}" + "".join(f"{n / s / 1e6:>16.2f}" for s in seconds))
+    print()
+
+
+def bench_order_pipeline(orders=200_000, producers=4, workers=4, capacity=1_000):
+    """
+    Several producer threads put() orders into a bounded BlockingCircularQueue
+    while an OrderWorkerPool drains it.
+    """
+    print(f"Order pipeline ({producers} producers, {workers} workers, capacity {capacity})")
+    pipeline = BlockingCircularQueue(capacity)
+    pool = OrderWorkerPool(pipeline, lambda order: order, workers)
+    per_producer = orders // producers
+
+    def produce(start):
+        for number in range(start, start + per_producer):
+            pipeline.put(f"Order #{number}")
+
+    feeds = [threading.Thread(target=produce, args=(i * per_producer,)) for i in range(producers)]
+    pool.start()
+    for feed in feeds:
+        feed.start()
+    for feed in feeds:
+        feed.join()
+    while pool.processed < per_producer * producers:
+        time.sleep(0.01)
+    stats = pool.stats()
+    pool.stop()
+    print(f"{stats['orders_per_sec']:.0f} orders/s, queue wait p50 {stats['wait_p50_ms']:.2f} ms, "
+          f"p95 {stats['wait_p95_ms']:.2f} ms, p99 {stats['wait_p99_ms']:.2f} ms")
+    print()
+
+
+def bench_order_records(orders=1_000_000):
+    """
+    Orders as the old preformatted strings against Order records with
+    OrderStats: memory per queued order, submit + process throughput, and
+    the cost of knowing the queue value (reparsing every string against
+    reading the running total).
+    """
+    print(f"Order records ({orders} orders)")
+    prices = [str(100 + number % 900) for number in range(orders)]
+
+    def fill_strings():
+        queued = CircularQueue(orders)
+        for number, price in enumerate(prices, start=1):
+            queued.enqueue(f"Order #{number}: Item {number % 100} (Price: ${price})")
+        return queued
+
+    def fill_records():
+        queued = CircularQueue(orders)
+        intake = OrderIntake(queued, OrderStats())
+        for number, price in enumerate(prices):
+            intake.submit(f"Item {number % 100}", price)
+        return queued, intake
+
+    def drain_strings(queued):
+        while queued.dequeue() is not None:
+            pass
+
+    def drain_records(queued, stats):
+        order = queued.dequeue()
+        while order is not None:
+            stats.processed(order)
+            order = queued.dequeue()
+
+    def value_from_strings(queued):
+        return sum(int(text[text.rindex("$") + 1:-1]) for text in queued)
+
+    print(f"{'':<10}{'bytes/order':>14}{'orders/s':>14}{'queue value (ms)':>20}")
+    strings = fill_strings()
+    kept, _ = measure_memory(fill_strings)
+    seconds = time_call(fill_strings) + time_call(drain_strings, strings)
+    value_ms = time_call(value_from_strings, fill_strings()) * 1000
+    print(f"{'strings':<10}{kept // orders:>14}{orders / seconds:>14.0f}{value_ms:>20.2f}")
+    del strings
+
+    kept, _ = measure_memory(fill_records)
+    start = time.perf_counter()
+    queued, intake = fill_records()
+    drain_records(queued, intake.stats)
+    seconds = time.perf_counter() - start
+    queued, intake = fill_records()
+    value_ms = time_call(lambda: intake.stats.queue_value) * 1000
+    print(f"{'records':<10}{kept // orders:>14}{orders / seconds:>14.0f}{value_ms:>20.4f}")
+    print()
+
+
+def bench_priority_orders(steps=200_000, shares=(0.1, 0.2, 0.3, 0.4), aging=0.01):
+    """
+    Replay a bursty stream of orders with priorities 0-3 (the shares of the
+    stream) through FIFO, priority and priority-with-aging queues, serving
+    one order per step while arrivals average 0.95 per step. Reports wall
+    clock throughput and, per priority class, the wait in steps.
+    """
+    print(f"Priority order queue ({steps} steps, aging {aging})")
+    rng = random.Random(0)
+    stream = []  # Orders arriving at each step
+    number = 0
+    for _ in range(steps):
+        arrivals = []
+        for _ in range(3 if rng.random() < 0.95 / 3 else 0):  # Bursts of three
+            priority = rng.choices(range(len(shares)), shares)[0]
+            arrivals.append(Order(number, "Item", 100, priority))
+            number += 1
+        stream.append(arrivals)
+    queues = {
+        "FIFO": lambda: CircularQueue(1_024, growable=True),
+        "priority": lambda: PriorityOrderQueue(1_024, growable=True),
+        "aging": lambda: PriorityOrderQueue(1_024, growable=True, aging=aging),
+    }
+    header = "".join(f"{f'p{priority} p99/max':>16}" for priority in range(len(shares)))
+    print(f"{'queue':<10}{'orders/s':>12}{header}")
+    for label, make in queues.items():
+        orders = make()
+        waits = [[] for _ in shares]
+        arrived_at = {}
+        start = time.perf_counter()
+        for step, arrivals in enumerate(stream):
+            for order in arrivals:
+                arrived_at[order.number] = step
+                orders.enqueue(order)
+            order = orders.dequeue()
+            if order is not None:
+                waits[order.priority].append(step - arrived_at.pop(order.number))
+        seconds = time.perf_counter() - start
+        cells = ""
+        for found in waits:
+            found.sort()
+            cells += f"{found[len(found) * 99 // 100]:>10}/{found[-1]:<5}" if found else f"{'-':>16}"
+        print(f"{label:<10}{number / seconds:>12.0f}{cells}")
+    print()
+
+
+def bench_history_memory(actions=100_000, burst=50, items=20):
+    """
+    Memory of the undo history for `actions` edits made in bursts: `burst`
+    adds of one item followed by `burst` removes of it. The old topic4 kept
+    one ("add"/"remove", item) tuple per edit on a plain list.
+    """
+    print(f"Undo history memory per {actions} actions (KiB)")
+    names = [f"Item {i}" for i in range(items)]
+    edits = []
+    while len(edits) < actions:
+        name = names[len(edits) // (2 * burst) % items]
+        edits += [("add", name)] * burst + [("remove", name)] * burst
+    edits = edits[:actions]
+
+    def build_tuples():
+        undo_stack = []
+        for action, name in edits:
+            undo_stack.append((action, name))
+        return undo_stack
+
+    def build_history():
+        cart = UndoRedoCart()
+        for action, name in edits:
+            if action == "add":
+                cart.add(name)
+            else:
+                cart.remove(name)
+        return cart
+
+    for label, build in (("list of tuples", build_tuples), ("UndoRedoCart", build_history)):
+        kept, _ = measure_memory(build)
+        print(f"{label:<16}{kept / 1024:>10.1f}")
+    print()
+
+
+def bench_journal(records=1_000_000, group_size=256):
+    """
+    Sustained appends per second to a CartJournal, then the time to recover
+    all records from disk. The request's 10M-record journal is
+    bench_journal(10_000_000).
+    """
+    print(f"Cart journal ({records} records, fsync every {group_size})")
+    names = [f"Item {i}" for i in range(100)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cart.journal")
+        journal = CartJournal(path, group_size=group_size)
+        journal.recover()
+        start = time.perf_counter()
+        for number in range(records):
+            journal.append(ADD if number % 3 else PROCESS, names[number % 100])
+        journal.close()
+        append_seconds = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        recovered = CartJournal(path)
+        start = time.perf_counter()
+        count = len(recovered.recover())
+        recover_seconds = time.perf_counter() - start
+        recovered.close()
+    print(f"{records / append_seconds:.0f} appends/s, {size / records:.1f} bytes/record, "
+          f"recovered {count} records in {recover_seconds:.2f} s")
+    print()
+
+
+def bench_sessions(sessions=100_000, actions=1_000_000, budgets_mb=(4, 16, 64)):
+    """
+    A SessionCartStore serving `actions` adds and processes spread over
+    `sessions` shoppers, a few of them busy and most idle (the top 1% of
+    sessions make a fifth of the actions), under several memory budgets.
+    Resident memory is measured with tracemalloc, next to the store's own
+    estimate, by loading the carts left in memory again.
+    """
+    print(f"Session carts ({sessions} sessions, {actions} actions)")
+    print(f"{'budget MB':>10}{'hit rate':>10}{'reloads':>10}{'reload us':>11}{'p99 us':>9}"
+          f"{'actions/s':>11}{'estimate MB':>13}{'traced MB':>11}{'disk MB':>9}")
+    rng = random.Random(0)
+    names = [f"Item {i}" for i in range(500)]
+    stream = [(f"shopper-{int(sessions * rng.random() ** 3)}", rng.random() < 0.7,
+               names[rng.randrange(len(names))]) for _ in range(actions)]
+    for budget in budgets_mb:
+        with tempfile.TemporaryDirectory() as directory:
+            store = SessionCartStore(directory, budget * 1024 * 1024)
+            start = time.perf_counter()
+            for session, adding, item in stream:
+                cart = store.get(session)
+                if adding:
+                    cart.add(item)
+                else:
+                    cart.process()
+            seconds = time.perf_counter() - start
+            store.flush()
+            stats = store.stats()
+
+            def reload_resident():
+                # The carts left in memory, loaded again under tracemalloc
+                resident = SessionCartStore(directory, math.inf)
+                for session in store.carts:
+                    resident.get(session)
+                return resident
+
+            traced, _ = measure_memory(reload_resident)
+            disk = sum(entry.stat().st_size for entry in os.scandir(directory))
+        print(f"{budget:>10}{stats['hit_rate']:>10.3f}{stats['reloads']:>10}{stats['reload_mean_us']:>11.1f}"
+              f"{stats['reload_p99_us']:>9}{actions / seconds:>11.0f}{stats['resident_bytes'] / 2 ** 20:>13.1f}"
+              f"{traced / 2 ** 20:>11.1f}{disk / 2 ** 20:>9.1f}")
+    print()
+
+
+def bench_history_archive(rows=50_000_000, items=10_000, chunk=5_000_000):
+    """
+    Queries over a HistoryArchive of `rows` synthetic actions (Zipf item
+    popularity, one action every 10 ms). Also the peak memory Python and
+    NumPy allocate during each query, which stays at a chunk of temporaries
+    however large the archive is. Needs NumPy.
+    """
+    print(f"History archive ({rows} rows, {items} items)")
+    try:
+        np = load_numpy()
+    except ImportError as error:
+        print(f"skipped: {error}\n")
+        return
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        archive = HistoryArchive(os.path.join(directory, "history"))
+        for number in range(items):
+            archive.item_id(f"Item {number}")
+        start = time.perf_counter()
+        for first in range(0, rows, chunk):
+            count = min(chunk, rows - first)
+            actions = np.where(rng.random(count) < 0.6, ADD, PROCESS).astype(np.uint8)
+            item_ids = ((rng.zipf(1.2, count) - 1) % items).astype(np.uint32)
+            times = (np.arange(first, first + count, dtype=np.int64) * 10_000_000)
+            archive.append_columns(actions, item_ids, times)
+        write_seconds = time.perf_counter() - start
+        size = sum(entry.stat().st_size for entry in os.scandir(directory))
+        print(f"written in {write_seconds:.1f} s, {size / rows:.1f} bytes/row "
+              "(a list of tuples takes about 64 bytes/row)")
+        print(f"{'query':<22}{'seconds':>10}{'peak MB':>10}")
+        queries = (
+            ("action_counts", archive.action_counts),
+            ("top_items(10)", archive.top_items),
+            ("add_process_ratios", archive.add_process_ratios),
+            ("process_rate(1 h)", lambda: archive.process_rate(3600)),
+        )
+        for label, query in queries:
+            start = time.perf_counter()
+            _, peak = measure_memory(query)
+            print(f"{label:<22}{time.perf_counter() - start:>10.2f}{peak / 2 ** 20:>10.1f}")
+        archive.close()
+    print()
+
+
+def write_catalog(path, skus, departments=20, categories=50, subcategories=20):
+    """
+    Write a synthetic catalog of skus items, four levels deep.
+    """
+    with open(path, "w", encoding="utf-8") as catalog:
+        for number in range(skus):
+            department = number % departments
+            category = number // departments % categories
+            subcategory = number // (departments * categories) % subcategories
+            catalog.write(f"Department {department}/Category {department}.{category}/"
+                          f"Subcategory {category}.{subcategory}/SKU {number}\n")
+
+
+def bench_catalog(sizes=(10_000, 100_000, 500_000)):
+    """
+    Time and memory to load a catalog file into the in-memory Catalog, to
+    write its CatalogFile index the first time, and to open the CatalogFile
+    and read the top two levels afterwards, which is what LazyCatalogTree
+    does at startup. Also the number of Treeview rows created at startup:
+    the top level plus one placeholder per category.
+    """
+    print("Catalog loading")
+    print(f"{'SKUs':>10}{'load (s)':>10}{'load (MB)':>11}{'index (s)':>11}"
+          f"{'open (ms)':>11}{'open (KB)':>11}{'startup rows':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.txt")
+        for n in sizes:
+            write_catalog(path, n)
+            seconds = time_call(Catalog.from_file, path)
+            kept, _ = measure_memory(lambda: Catalog.from_file(path))
+            index_seconds = time_call(CatalogFile.open, path)
+
+            def startup():
+                catalog = CatalogFile.open(path)
+                top_level = catalog.children(catalog.ROOT)
+                rows = len(top_level) + sum(catalog.has_children(node) for node in top_level)
+                for node in top_level:
+                    rows += sum(catalog.has_children(child) for child in catalog.children(node))
+                return catalog, rows
+
+            open_seconds = time_call(startup)
+            open_kept, _ = measure_memory(startup)
+            catalog, startup_rows = startup()
+            catalog.close()
+            os.remove(path + ".index")
+            print(f"{n:>10}{seconds:>10.2f}{kept / 2 ** 20:>11.1f}{index_seconds:>11.2f}"
+                  f"{open_seconds * 1000:>11.2f}{open_kept / 1024:>11.1f}{startup_rows:>14}")
+    print()
+
+
+def bench_search(skus=500_000, keystrokes=200):
+    """
+    Suggestion latency per keystroke over a catalog of skus items: typing
+    existing names character by character, and the same names with a typo,
+    which falls through to the trigram index. Reports percentiles in ms.
+    """
+    print(f"Search suggestions ({skus} SKUs)")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.txt")
+        write_catalog(path, skus)
+        catalog = Catalog.from_file(path)
+    build_seconds = time_call(SearchIndex, catalog.names)
+    index = SearchIndex(catalog.names)
+    rng = random.Random(0)
+    names = [catalog.name(rng.randrange(1, len(catalog) + 1)) for _ in range(keystrokes // 10)]
+    typos = [name[:2] + name[3:] for name in names]  # One letter dropped
+    print(f"index built in {build_seconds:.2f} s")
+    print(f"{'typing':<14}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for label, words in (("exact names", names), ("with a typo", typos)):
+        latencies = []
+        for word in words:
+            for end in range(1, len(word) + 1):
+                latencies.append(time_call(index.suggest, word[:end]))
+        latencies.sort()
+        cells = "".join(f"{latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1000:>10.3f}"
+                        for p in (50, 95, 99, 100))
+        print(f"{label:<14}{cells}")
+    print()
+
+
+def bench_cart_snapshots(sizes=(1_000, 100_000, 1_000_000), operations=100_000, reader_seconds=1.0):
+    """
+    The topic5/topic6 cart with the old deque, snapshotted by copy(),
+    against the persistent stack of LifoCart: the cost of one snapshot of
+    a cart of n items, of one add plus process, and the memory per item.
+    The last column is the add/process pairs per second a writer thread
+    manages while a reader thread takes snapshots in a loop.
+    """
+    print("Cart snapshots")
+    print(f"{'cart':<10}{'n':>10}{'snapshot us':>13}{'add+process ns':>16}{'bytes/item':>12}{'pairs/s w/ reader':>19}")
+    for n in sizes:
+        for label, make in (("deque", DequeLifoCart), ("persistent", LifoCart)):
+            def build():
+                cart = make()
+                for number in range(n):
+                    cart.add("Milk")
+                return cart
+
+            kept, _ = measure_memory(build)
+            cart = build()
+            rounds = max(10, min(10_000, 10_000_000 // n))
+            snapshot_us = time_call(lambda: [cart.snapshot() for _ in range(rounds)]) / rounds * 1e6
+
+            def mutate(count):
+                for _ in range(count):
+                    cart.add("Milk")
+                    cart.process()
+
+            pair_ns = time_call(mutate, operations) / operations * 1e9
+
+            done = threading.Event()
+
+            def reader():
+                while not done.is_set():
+                    cart.snapshot()
+
+            thread = threading.Thread(target=reader)
+            thread.start()
+            pairs = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < reader_seconds:
+                mutate(100)
+                pairs += 100
+            pairs_per_second = pairs / (time.perf_counter() - start)
+            done.set()
+            thread.join()
+            print(f"{label:<10}{n:>10}{snapshot_us:>13.2f}{pair_ns:>16.0f}{kept / n:>12.0f}{pairs_per_second:>19.0f}")
+    print()
+
+
+def zipf_baskets(baskets, items=5_000, themes=200, seed=0):
+    """
+    Synthetic baskets: each picks a theme (popular themes more often) and
+    mostly draws that theme's items, popular ones first, with a fifth of
+    the picks from the whole catalog.
+    """
+    rng = random.Random(seed)
+    theme_items = [rng.sample(range(items), 50) for _ in range(themes)]
+    found = []
+    for _ in range(baskets):
+        theme = theme_items[min(int(rng.paretovariate(1.0)), themes) - 1]
+        basket = []
+        for _ in range(rng.randint(2, 12)):
+            if rng.random() < 0.2:
+                number = min(int(rng.paretovariate(1.0)), items) - 1
+            else:
+                number = theme[min(int(rng.paretovariate(1.2)), 50) - 1]
+            basket.append(f"Item {number}")
+        found.append(basket)
+    return found
+
+
+def bench_copurchase(baskets=50_000, widths=(1 << 10, 1 << 12, 1 << 14, 1 << 16), depth=4, top_k=10):
+    """
+    CoPurchaseIndex on Zipf baskets for several sketch widths: adds per
+    second, memory, and accuracy against exact pair counts for the 100
+    most bought items. A suggestion counts as a hit when its exact count
+    is at least that of the item's true 5th partner; the error is the
+    overcount of the suggested pairs relative to their exact counts.
+    """
+    print(f"Co-purchase index ({baskets} baskets, depth {depth}, top {top_k})")
+    stream = zipf_baskets(baskets)
+
+    def feed(index):
+        for basket in stream:
+            in_cart = {}
+            for item in basket:
+                index.add(item, reversed(in_cart))  # Most recently added first
+                in_cart[item] = in_cart.pop(item, 0) + 1
+
+    class ExactPairs:
+        basket_limit = CoPurchaseIndex().basket_limit
+
+        def __init__(self):
+            self.pairs = {}
+
+        def add(self, item, basket):
+            # The same items as CoPurchaseIndex.add counts
+            seen = {item}
+            for other in islice(basket, 4 * self.basket_limit):
+                if other not in seen:
+                    seen.add(other)
+                    self.pairs.setdefault(item, Counter())[other] += 1
+                    self.pairs.setdefault(other, Counter())[item] += 1
+                    if len(seen) > self.basket_limit:
+                        break
+
+    exact = ExactPairs()
+    feed(exact)
+    popular = sorted(exact.pairs, key=lambda item: -sum(exact.pairs[item].values()))[:100]
+    adds = sum(len(basket) for basket in stream)
+    print(f"{'width':>8}{'sketch KiB':>12}{'total KiB':>11}{'adds/s':>10}{'hit@5':>8}{'overcount':>11}{'suggest us':>12}")
+    for width in widths:
+        def build():
+            index = CoPurchaseIndex(top_k, width, depth)
+            feed(index)
+            return index
+
+        total, _ = measure_memory(build)
+        index = CoPurchaseIndex(top_k, width, depth)
+        seconds = time_call(feed, index)
+        hits = errors = checked = 0
+        for item in popular:
+            partners = exact.pairs[item]
+            fifth = sorted(partners.values(), reverse=True)[:5][-1]
+            for partner, estimate in index.suggest(item, 5):
+                hits += partners[partner] >= fifth
+                if partners[partner]:
+                    errors += (estimate - partners[partner]) / partners[partner]
+                    checked += 1
+        suggest_us = time_call(lambda: [index.suggest(item) for item in popular * 100]) / (len(popular) * 100) * 1e6
+        print(f"{width:>8}{4 * width * depth / 1024:>12.0f}{total / 1024:>11.0f}{adds / seconds:>10.0f}"
+              f"{hits / (5 * len(popular)):>8.2f}{errors / max(checked, 1):>11.1%}{suggest_us:>12.2f}")
+    print()
+
+
+def bench_cart_summary(sizes=(1_000, 10_000, 100_000, 1_000_000), operations=200):
+    """
+    Cost of one add or process plus refreshing the cart line, for carts
+    already holding n items: the old full ", ".join of the cart against the
+    incremental CartSummary. Microseconds per operation.
+    """
+    print("Cart line refresh (microseconds per add/process)")
+    print(f"{'n':>10}{'join':>14}{'summary':>14}")
+    rng = random.Random(0)
+    for n in sizes:
+        names = [f"Item {min(int(rng.paretovariate(1.0)), 10_000)}" for _ in range(n)]
+        cart = LifoCart()
+        for name in names:
+            cart.add(name)
+        join_ops = max(2, min(operations, 2_000_000 // n))  # The join is O(n); keep large carts quick
+
+        def joined(count):
+            for number in range(count):
+                if number % 2:
+                    cart.process()
+                else:
+                    cart.add(names[number])
+                f"Cart: {', '.join(cart)}"
+
+        def summarised(count):
+            for number in range(count):
+                if number % 2:
+                    cart.process()
+                else:
+                    cart.add(names[number])
+                cart.summary.text()
+
+        join_us = time_call(joined, join_ops) / join_ops * 1e6
+        summary_us = time_call(summarised, operations) / operations * 1e6
+        print(f"{n:>10}{join_us:>14.1f}{summary_us:>14.1f}")
+    print()
+
+
+def bench_instrument_overhead(operations=500_000):
+    """
+    The same stack and queue loop in a fresh interpreter with
+    SHOPPING_PROFILE unset and set, since the setting is read at import.
+    """
+    print(f"Instrumentation overhead ({operations} add/process pairs, ns per pair)")
+    code = (
+        "import time\n"
+        "from shopping_core.cart import LifoCart\n"
+        "from shopping_core.orders import CircularQueue\n"
+        "cart, orders = LifoCart(), CircularQueue(16)\n"
+        "start = time.perf_counter()\n"
+        f"for _ in range({operations}):\n"
+        "    cart.add('Milk'); cart.process(); orders.enqueue('Order'); orders.dequeue()\n"
+        f"print((time.perf_counter() - start) / {operations} * 1e9)\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    for label, setting in (("disabled", ""), ("enabled", "1")):
+        env = dict(os.environ, SHOPPING_PROFILE=setting)
+        output = subprocess.run([sys.executable, "-c", code], cwd=here, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        print(f"{label:<16}{float(output):>10.0f}")
+    print()
+
+
+def bench_startup(runs=5):
+    """
+    Time a fresh interpreter importing the headless engines against one
+    importing the Tk apps. Reports the best of several runs.
+    """
+    print("Startup (milliseconds, best of %d)" % runs)
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = {
+        "python only": "pass",
+        "shopping_core": "import shopping_core, sys; assert 'tkinter' not in sys.modules",
+        "Tk apps": "import topic3, topic4, topic5, topic6",
+    }
+    for name, code in paths.items():
+        command = [sys.executable, "-c", code]
+        best = min(time_call(lambda: subprocess.run(command, cwd=here, check=True)) for _ in range(runs))
+        print(f"{name:<16}{best * 1000:>10.1f}")
+    print()
+
+
+# Workloads for the suite. Each gives `keys`, n item numbers below
+# `distinct`, and `arrivals`, how many items arrive at each step of a
+# queue case (one item is served per step).
+
+def uniform_workload(n, distinct, rng):
+    return [rng.randrange(distinct) for _ in range(n)], [1] * n
+
+
+def zipf_workload(n, distinct, rng, exponent=1.1):
+    """
+    Item k is picked with weight 1 / (k + 1) ** exponent: a few items are
+    very popular, most are rare.
+    """
+    weights = [1 / (k + 1) ** exponent for k in range(distinct)]
+    return rng.choices(range(distinct), weights, k=n), [1] * n
+
+
+def burst_workload(n, distinct, rng, burst=10):
+    """
+    Uniform keys arriving in bursts of `burst`, with quiet steps between.
+    """
+    keys = [rng.randrange(distinct) for _ in range(n)]
+    arrivals = []
+    remaining = n
+    while remaining:
+        if rng.random() < 1 / burst:
+            arrivals.append(min(burst, remaining))
+            remaining -= arrivals[-1]
+        else:
+            arrivals.append(0)
+    return keys, arrivals
+
+
+WORKLOADS = {"uniform": uniform_workload, "zipf": zipf_workload, "burst": burst_workload}
+
+
+# Suite cases. Each takes (keys, arrivals, names) and returns
+# (setup, run): setup() builds the starting state outside the timing and
+# run(state) does one operation per key.
+
+def case_doubly_linked_list(keys, arrivals, names):
+    """
+    topic2 basket: add every item, remove one every third step.
+    """
+    def run(cart):
+        for step, key in enumerate(keys):
+            cart.add(names[key])
+            if step % 3 == 2 and names[keys[step - 1]] in cart:
+                cart.remove(names[keys[step - 1]])
+    return DoublyLinkedList, run
+
+
+def case_circular_queue(keys, arrivals, names):
+    """
+    topic3 order queue: enqueue each step's arrivals, dequeue one.
+    """
+    def run(orders):
+        position = 0
+        for count in arrivals:
+            for key in keys[position:position + count]:
+                orders.enqueue(names[key])
+            position += count
+            orders.dequeue()
+    return lambda: CircularQueue(1_024, growable=True), run
+
+
+def case_priority_order_queue(keys, arrivals, names):
+    """
+    topic3 priority mode: as case_circular_queue, priority = key % 4.
+    """
+    def setup():
+        return PriorityOrderQueue(1_024, growable=True, aging=0.01), [
+            Order(number, names[key], 100, key % 4) for number, key in enumerate(keys)]
+
+    def run(state):
+        orders, records = state
+        position = 0
+        for count in arrivals:
+            for order in records[position:position + count]:
+                orders.enqueue(order)
+            position += count
+            orders.dequeue()
+    return setup, run
+
+
+def case_undo_redo_cart(keys, arrivals, names):
+    """
+    topic4 cart: add every item, undo every fourth step, redo every eighth.
+    """
+    def run(cart):
+        for step, key in enumerate(keys):
+            cart.add(names[key])
+            if step % 4 == 3:
+                cart.undo()
+            if step % 8 == 7:
+                cart.redo()
+    return UndoRedoCart, run
+
+
+def case_lifo_cart(keys, arrivals, names):
+    """
+    topic5/topic6 cart: add each step's arrivals, process one.
+    """
+    def run(cart):
+        position = 0
+        for count in arrivals:
+            for key in keys[position:position + count]:
+                cart.add(names[key])
+            position += count
+            cart.process()
+    return LifoCart, run
+
+
+def case_cart_summary(keys, arrivals, names):
+    """
+    The cart line totals: add every item, remove every other one, read the text.
+    """
+    def run(summary):
+        for step, key in enumerate(keys):
+            summary.add(names[key])
+            if step % 2:
+                summary.remove(names[key])
+            summary.text()
+    return CartSummary, run
+
+
+def case_insertion_sort(keys, arrivals, names):
+    """
+    topic7 original sort. Quadratic, so only run on the smaller sizes.
+    """
+    if len(keys) > INSERTION_SORT_MAX:
+        return None
+    return (lambda: [{"product": names[key], "priority": key} for key in keys]), insertion_sort
+
+
+def case_sort_by_priority(keys, arrivals, names):
+    """
+    topic7 sort used today.
+    """
+    return (lambda: [{"product": names[key], "priority": key} for key in keys]), sort_by_priority
+
+
+CASES = {
+    "DoublyLinkedList": case_doubly_linked_list,
+    "CircularQueue": case_circular_queue,
+    "PriorityOrderQueue": case_priority_order_queue,
+    "UndoRedoCart": case_undo_redo_cart,
+    "LifoCart": case_lifo_cart,
+    "CartSummary": case_cart_summary,
+    "insertion_sort": case_insertion_sort,
+    "sort_by_priority": case_sort_by_priority,
+}
+
+
+def measure(setup, run, operations, repeat=5, warmup=1):
+    """
+    Time run(setup()) repeat times after warmup untimed runs and return
+    nanoseconds per operation statistics.
+    """
+    for _ in range(warmup):
+        run(setup())
+    runs = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter_ns()
+        run(state)
+        runs.append((time.perf_counter_ns() - start) / operations)
+    return {"min": min(runs), "median": statistics.median(runs), "mean": statistics.fmean(runs),
+            "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0, "runs": runs}
+
+
+def run_suite(cases=None, workloads=None, sizes=(1_000, 10_000, 100_000), repeat=5, warmup=1,
+              distinct=1_000, seed=0):
+    """
+    Run the suite and return its results as a JSON-ready dict.
+    """
+    cases = cases or list(CASES)
+    workloads = workloads or list(WORKLOADS)
+    names = [f"Item {key}" for key in range(distinct)]
+    results = []
+    print(f"{'case':<20}{'workload':<10}{'n':>10}{'min':>10}{'median':>10}{'stdev':>10}  ns/op")
+    for workload in workloads:
+        for n in sizes:
+            keys, arrivals = WORKLOADS[workload](n, distinct, random.Random(seed))
+            for case in cases:
+                built = CASES[case](keys, arrivals, names)
+                if built is None:
+                    continue
+                stats = measure(*built, operations=n, repeat=repeat, warmup=warmup)
+                results.append({"case": case, "workload": workload, "n": n, **stats})
+                print(f"{case:<20}{workload:<10}{n:>10}{stats['min']:>10.0f}{stats['median']:>10.0f}"
+                      f"{stats['stdev']:>10.0f}")
+    return {"python": sys.version.split()[0], "platform": platform.platform(),
+            "machine": platform.machine(), "seed": seed, "distinct": distinct, "repeat": repeat,
+            "warmup": warmup, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+
+
+def compare_runs(current, baseline, threshold=1.10):
+    """
+    Print the median of each case against the same case in a saved run.
+    """
+    before = {(r["case"], r["workload"], r["n"]): r["median"] for r in baseline["results"]}
+    print(f"Against the run of {baseline.get('time', '?')} (median ns/op)")
+    print(f"{'case':<20}{'workload':<10}{'n':>10}{'before':>10}{'now':>10}{'ratio':>8}")
+    for result in current["results"]:
+        old = before.get((result["case"], result["workload"], result["n"]))
+        if old is None:
+            continue
+        ratio = result["median"] / old if old else math.inf
+        flag = "  slower" if ratio > threshold else "  faster" if ratio < 1 / threshold else ""
+        print(f"{result['case']:<20}{result['workload']:<10}{result['n']:>10}{old:>10.0f}"
+              f"{result['median']:>10.0f}{ratio:>8.2f}{flag}")
+
+
+COMPARISONS = [
+    bench_startup,
+    bench_instrument_overhead,
+    bench_priority_sort,
+    bench_first_page,
+    bench_list_rendering,
+    bench_cart_list,
+    bench_cart_memory,
+    bench_cart_summary,
+    bench_cart_snapshots,
+    bench_circular_queue,
+    bench_history_memory,
+    bench_history_archive,
+    bench_journal,
+    bench_sessions,
+    bench_catalog,
+    bench_search,
+    bench_copurchase,
+    bench_order_pipeline,
+    bench_order_records,
+    bench_priority_orders,
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the shopping assistant data structures.")
+    parser.add_argument("comparisons", nargs="*", help="bench_* functions to run (default: all)")
+    parser.add_argument("--suite", action="store_true", help="run the repeatable suite instead")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES))
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the suite results to this file")
+    parser.add_argument("--compare", help="suite results file to compare against")
+    args = parser.parse_args(argv)
+    if args.suite:
+        results = run_suite(args.cases, args.workloads, args.sizes, args.repeat, args.warmup, seed=args.seed)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as out:
+                json.dump(results, out, indent=2)
+        if args.compare:
+            print()
+            with open(args.compare, encoding="utf-8") as saved:
+                compare_runs(results, json.load(saved))
+        return
+    by_name = {bench.__name__: bench for bench in COMPARISONS}
+    unknown = [name for name in args.comparisons if name not in by_name]
+    if unknown:
+        parser.error(f"unknown comparison {', '.join(unknown)}; choose from {', '.join(by_name)}")
+    for name in args.comparisons or by_name:
+        by_name[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Order intake over a local socket for topic3.ShoppingAssistantApp.
+
+Clients send one JSON object per line, {"order": "Rice", "price": "1200"},
+and get one reply per line: {"ok": true, "order": "Order #7: Rice (Price: $1200)"}
+or {"ok": false, "error": "..."}. Orders are checked with the same
+validate_order() as the Add Order button. A line over 64 KiB gets an error
+reply and closes the connection.
+
+The asyncio loop runs in its own thread so the Tk mainloop keeps the main
+thread; the app only redraws the queue from a Tk after() poll.
+
+    python order_server.py --gui           # Tk app with the server on port 8765
+    python order_server.py --bench         # offline load test on a free port
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+from shopping_core.orders import BlockingCircularQueue, OrderIntake, validate_order
+
+
+class OrderServer:
+    def __init__(self, intake, host="127.0.0.1", port=8765):
+        self.intake = intake
+        self.host = host
+        self.port = port  # Port 0 picks a free port; the real one is stored once listening
+        self.loop = None
+        self.server = None
+        self.ready = threading.Event()
+        self.error = None  # Exception that stopped serve() before it was listening
+
+    def handle_request(self, line):
+        try:
+            request = json.loads(line)
+        except (ValueError, RecursionError):  # RecursionError for deeply nested arrays or objects
+            return {"ok": False, "error": "Each line must be a JSON object."}
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "Each line must be a JSON object."}
+        order = request.get("order", "")
+        price = request.get("price", "")
+        if not isinstance(order, str) or not isinstance(price, str):
+            return {"ok": False, "error": "Order and price must be strings."}
+        order, price = order.strip(), price.strip()
+        error = validate_order(order, price)
+        if error:
+            return {"ok": False, "error": error}
+        numbered_order = self.intake.submit(order, price)
+        if numbered_order is None:
+            return {"ok": False, "error": "Cannot add order. The queue is full!"}
+        return {"ok": True, "order": str(numbered_order)}
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Over the stream limit; the rest of it would read as another request
+                    writer.write(json.dumps({"ok": False, "error": "Request line is too long."}).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                writer.write(json.dumps(self.handle_request(line)).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        try:
+            self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+        except Exception as error:  # Such as OSError when the port is in use
+            self.error = error
+            return
+        finally:
+            self.ready.set()
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def start_in_thread(self):
+        """
+        Run the server on a daemon thread and return once it is listening.
+        Raises the error if it could not start listening.
+        """
+        thread = threading.Thread(target=asyncio.run, args=(self.serve(),), daemon=True)
+        thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return thread
+
+    def stop(self):
+        if self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+
+async def send_orders(host, port, count, latencies):
+    """
+    One client connection sending count orders, one request in flight at a time.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    accepted = 0
+    for number in range(count):
+        request = json.dumps({"order": f"Item {number}", "price": "100"}).encode() + b"\n"
+        start = time.perf_counter()
+        writer.write(request)
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        accepted += reply["ok"]
+    writer.close()
+    await writer.wait_closed()
+    return accepted
+
+
+async def run_load(host, port, orders=50_000, connections=8):
+    """
+    Send orders over several connections and report accepted orders per
+    second and request/reply latency percentiles in milliseconds.
+    """
+    latencies = []
+    start = time.perf_counter()
+    accepted = await asyncio.gather(*(send_orders(host, port, orders // connections, latencies)
+                                      for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    result = {"accepted": sum(accepted), "orders_per_sec": sum(accepted) / elapsed}
+    for percentile in (50, 95, 99):
+        result[f"latency_p{percentile}_ms"] = latencies[len(latencies) * percentile // 100] * 1000
+    return result
+
+
+def bench(orders=50_000, connections=8):
+    orders_queue = BlockingCircularQueue(1_000, growable=True)
+    server = OrderServer(OrderIntake(orders_queue), port=0)
+    server.start_in_thread()
+    result = asyncio.run(run_load(server.host, server.port, orders, connections))
+    server.stop()
+    print(f"{result['accepted']} orders accepted, {result['orders_per_sec']:.0f} orders/s, "
+          f"latency p50 {result['latency_p50_ms']:.2f} ms, p95 {result['latency_p95_ms']:.2f} ms, "
+          f"p99 {result['latency_p99_ms']:.2f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gui", action="store_true", help="run the Tk app with the order server")
+    parser.add_argument("--bench", action="store_true", help="run the offline load test")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--orders", type=int, default=50_000)
+    parser.add_argument("--connections", type=int, default=8)
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.orders, args.connections)
+    if args.gui or not args.bench:
+        import tkinter as tk  # The GUI is only loaded when asked for, so --bench runs headless
+        from topic3 import ShoppingAssistantApp
+        root = tk.Tk()
+        app = ShoppingAssistantApp(root, capacity=1_000, growable=True, server_port=args.port)
+        root.mainloop()
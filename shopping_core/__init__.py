@@ -0,0 +1,12 @@
+"""
+Headless engines behind the shopping assistant apps.
+
+Nothing in this package imports tkinter, so the carts, the order queue, the
+undo/redo history and the priority sorter can run in a server, a benchmark
+or the replay CLI (python -m shopping_core ops.txt) without a display.
+"""
+from shopping_core.cart import CartList, DoublyLinkedList, LifoCart
+from shopping_core.history import UndoRedoCart
+from shopping_core.orders import (BlockingCircularQueue, CircularQueue, Order, OrderIntake,
+                                  OrderStats, OrderWorkerPool, PriorityOrderQueue, validate_order)
+from shopping_core.priority_sort import SortedProductList, sort_by_priority
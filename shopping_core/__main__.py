@@ -0,0 +1,3 @@
+from shopping_core.replay import main
+
+main()
@@ -0,0 +1,256 @@
+"""
+Columnar archive of cart history for topic5.py and topic6.py, with
+vectorized queries.
+
+A cart history of ("Add"/"Process", item) tuples costs 60-odd bytes per
+entry in memory and can only be scanned in a Python loop. HistoryArchive
+keeps it on disk as three columns of fixed-width values, 13 bytes a row:
+
+    <path>.actions  uint8   journal operation, ADD or PROCESS
+    <path>.items    uint32  index into the item name table
+    <path>.times    int64   nanoseconds since the epoch
+    <path>.names    the item name table, as journal ADD records
+
+Appending and reading single rows need only the standard library. The
+queries memory-map the columns with NumPy and go through them CHUNK_ROWS
+at a time, so the operating system pages the files in and out as needed
+and no query holds more than a chunk of temporaries. NumPy is optional:
+it is imported by the queries only, and they raise ImportError without it.
+"""
+import math
+import os
+import time
+from array import array
+
+from shopping_core.journal import ADD, PROCESS, encode, read_records
+
+CHUNK_ROWS = 1 << 18  # Rows per step of a query; small enough for the temporaries to stay in cache
+
+ACTION_CODES = {"Add": ADD, "Process": PROCESS}
+ACTIONS = {code: action for action, code in ACTION_CODES.items()}
+
+COLUMNS = (("actions", "B", "uint8"), ("items", "I", "uint32"), ("times", "q", "int64"))
+
+
+def load_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("history archive queries need NumPy (pip install numpy); "
+                          "appending to the archive works without it") from None
+    return numpy
+
+
+class HistoryArchive:
+    """
+    Cart history appended to columns on disk. Rows are buffered and written
+    every `buffer_rows` rows, on flush() and on close(). A row cut short by
+    a crash is trimmed off when the archive is opened again.
+    """
+    def __init__(self, path, buffer_rows=65_536):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        names, valid_size = read_records(path + ".names")
+        self.names = [name for _, name in names]
+        self.ids = {name: number for number, name in enumerate(self.names)}
+        self.names_file = open(path + ".names", "ab")
+        if self.names_file.tell() != valid_size:
+            self.names_file.truncate(valid_size)
+
+        widths = [array(code).itemsize for _, code, _ in COLUMNS]
+        paths = [f"{path}.{column}" for column, _, _ in COLUMNS]
+        self.rows = min(os.path.getsize(column_path) // width if os.path.exists(column_path) else 0
+                        for column_path, width in zip(paths, widths))
+        self.files = []
+        for column_path, width in zip(paths, widths):
+            column = open(column_path, "ab")
+            if column.tell() != self.rows * width:
+                column.truncate(self.rows * width)
+            self.files.append(column)
+        self.pending = [array(code) for _, code, _ in COLUMNS]
+        self.readers = None  # Actions and items files opened for entry(), on first use
+
+    def __len__(self):
+        return self.rows + len(self.pending[0])
+
+    def item_id(self, name):
+        """
+        The index of name in the item name table, adding it if it is new.
+        """
+        number = self.ids.get(name)
+        if number is None:
+            number = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.names_file.write(encode(ADD, name))
+        return number
+
+    def append(self, action, item, when=None):
+        """
+        Add one history entry; action is "Add" or "Process", when is in
+        nanoseconds since the epoch and defaults to now.
+        """
+        actions, items, times = self.pending
+        actions.append(ACTION_CODES[action])
+        items.append(self.item_id(item))
+        times.append(time.time_ns() if when is None else when)
+        if len(actions) >= self.buffer_rows:
+            self.flush()
+
+    def extend(self, history, when=None):
+        """
+        Add a list of (action, item) entries, all stamped with the same time.
+        """
+        when = time.time_ns() if when is None else when
+        for action, item in history:
+            self.append(action, item, when)
+
+    def append_columns(self, actions, item_ids, times):
+        """
+        Add whole columns at once: arrays with a tofile() method (array.array
+        or NumPy) of uint8 action codes, uint32 item ids from item_id() and
+        int64 nanoseconds.
+        """
+        if not len(actions) == len(item_ids) == len(times):
+            raise ValueError("columns must have the same length")
+        self.flush()
+        for column, values in zip(self.files, (actions, item_ids, times)):
+            values.tofile(column)
+            column.flush()
+        self.rows += len(actions)
+
+    def flush(self):
+        self.names_file.flush()  # Names first, so every item id on disk has its name
+        for column, values, (_, code, _) in zip(self.files, self.pending, COLUMNS):
+            values.tofile(column)
+            column.flush()
+        self.rows += len(self.pending[0])
+        self.pending = [array(code) for _, code, _ in COLUMNS]
+
+    def entry(self, index):
+        """
+        The (action, item) history entry in row index, for showing a few rows
+        at a time; it reads the files directly, without NumPy.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("archive row out of range")
+        if index >= self.rows:
+            actions, items, _ = self.pending
+            return ACTIONS[actions[index - self.rows]], self.names[items[index - self.rows]]
+        if self.readers is None:
+            self.readers = [open(f"{self.path}.{column}", "rb") for column, _, _ in COLUMNS[:2]]
+        row = []
+        for reader, (_, code, _) in zip(self.readers, COLUMNS):
+            values = array(code)
+            reader.seek(index * values.itemsize)
+            values.frombytes(reader.read(values.itemsize))
+            row.append(values[0])
+        return ACTIONS[row[0]], self.names[row[1]]
+
+    def close(self):
+        self.flush()
+        self.names_file.close()
+        for column in self.files + (self.readers or []):
+            column.close()
+
+    def columns(self):
+        """
+        Read-only NumPy arrays (actions, items, times) mapped onto the files.
+        """
+        np = load_numpy()
+        self.flush()
+        if not self.rows:
+            return tuple(np.empty(0, dtype) for _, _, dtype in COLUMNS)
+        return tuple(np.memmap(f"{self.path}.{column}", dtype, "r", shape=(self.rows,))
+                     for column, _, dtype in COLUMNS)
+
+    def chunks(self):
+        """
+        Yield (actions, items, times) views of CHUNK_ROWS rows at a time.
+        """
+        actions, items, times = self.columns()
+        for start in range(0, len(actions), CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            yield actions[start:stop], items[start:stop], times[start:stop]
+
+    def action_counts(self):
+        """
+        {"Add": rows, "Process": rows}.
+        """
+        np = load_numpy()
+        totals = dict.fromkeys(ACTION_CODES, 0)
+        for actions, _, _ in self.chunks():
+            for action, code in ACTION_CODES.items():
+                totals[action] += int(np.count_nonzero(actions == code))
+        return totals
+
+    def item_action_counts(self):
+        """
+        NumPy arrays (adds, processes) of each item, by item id, counted in
+        one pass: item id * 2 + 1 for a process is a single bincount key.
+        """
+        np = load_numpy()
+        totals = np.zeros(2 * len(self.names), np.int64)
+        for actions, items, _ in self.chunks():
+            keys = items.astype(np.intp)
+            keys <<= 1
+            keys |= actions == PROCESS
+            totals += np.bincount(keys, minlength=len(totals))
+        return totals[0::2], totals[1::2]
+
+    def item_counts(self, action="Add"):
+        """
+        NumPy array of how often each item took the action, by item id.
+        """
+        adds, processes = self.item_action_counts()
+        return adds if ACTION_CODES[action] == ADD else processes
+
+    def top_items(self, n=10, action="Add"):
+        """
+        Up to n (item, count) pairs, most frequent first.
+        """
+        if n <= 0:
+            return []  # argpartition(-0)[-0:] would be every item
+        np = load_numpy()
+        totals = self.item_counts(action)
+        n = min(n, len(totals))
+        if n < len(totals):
+            found = np.argpartition(totals, -n)[-n:]
+        else:
+            found = np.arange(len(totals))
+        found = found[np.argsort(-totals[found], kind="stable")]
+        return [(self.names[number], int(totals[number])) for number in found if totals[number]]
+
+    def add_process_ratios(self):
+        """
+        {item: adds / processes} for every item added or processed; inf for
+        items added but never processed.
+        """
+        adds, processes = self.item_action_counts()
+        return {name: added / processed if processed else math.inf
+                for name, added, processed in zip(self.names, adds.tolist(), processes.tolist())
+                if added or processed}
+
+    def process_rate(self, window_seconds):
+        """
+        Items processed per window of window_seconds, from the first row to
+        the last, as NumPy arrays (window start in nanoseconds, count).
+        Rows are assumed to be in time order, as append() writes them, so
+        each chunk is split at the window starts with a binary search and a
+        running count of processes gives the count per window.
+        """
+        np = load_numpy()
+        actions, _, times = self.columns()
+        if not len(times):
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        window = int(window_seconds * 1e9)
+        first = int(times[0])
+        starts = first + np.arange((int(times[-1]) - first) // window + 1, dtype=np.int64) * window
+        totals = np.zeros(len(starts), np.int64)
+        for actions, _, times in self.chunks():
+            low = (int(times[0]) - first) // window
+            high = (int(times[-1]) - first) // window
+            processed = np.zeros(len(actions) + 1, np.int64)
+            np.cumsum(actions == PROCESS, out=processed[1:])
+            bounds = np.concatenate(([0], np.searchsorted(times, starts[low + 1:high + 1]), [len(times)]))
+            totals[low:high + 1] += np.diff(processed[bounds])
+        return starts, totals
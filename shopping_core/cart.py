@@ -0,0 +1,327 @@
+"""
+Shopping carts used by the assistant apps.
+
+DoublyLinkedList - distinct items with quantities, by last use (topic2.PY)
+CartList         - every added item in order, with O(1) removal (topic4.py)
+LifoCart         - items processed last-in, first-out, with a history and O(1)
+                   snapshots (topic5.py, topic6.py)
+"""
+from collections import deque
+
+from shopping_core.instrument import timed
+from shopping_core.summary import CartSummary
+
+
+class Node:
+    __slots__ = ("item", "count", "prev", "next")
+
+    def __init__(self, item):
+        self.item = item
+        self.count = 1
+        self.prev = None
+        self.next = None
+
+
+class DoublyLinkedList:
+    """
+    Cart items in order of last use, one node per distinct item with its quantity.
+    A dict maps each item to its node, so add, remove and move_to_end are O(1).
+    str() renders the whole cart in one pass; `summary` keeps the totals
+    for a short cart line.
+
+    The nodes and the summary cost more memory per item than a plain dict
+    of counts (see bench_cart_memory); that is the price of the order and
+    the O(1) moves.
+    """
+    def __init__(self):
+        self.head = None
+        self.tail = None
+        self.nodes = {}
+        self.summary = CartSummary()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, item):
+        return item in self.nodes
+
+    def __iter__(self):
+        node = self.head
+        while node is not None:
+            yield node.item, node.count
+            node = node.next
+
+    def __reversed__(self):
+        node = self.tail
+        while node is not None:
+            yield node.item, node.count
+            node = node.prev
+
+    def count(self, item):
+        node = self.nodes.get(item)
+        return node.count if node else 0
+
+    @timed("basket add")
+    def add(self, item):
+        node = self.nodes.get(item)
+        if node:
+            node.count += 1
+            self.move_to_end(item)
+        else:
+            node = self.nodes[item] = Node(item)
+            self._link_last(node)
+        self.summary.add(item)
+
+    @timed("basket remove")
+    def remove(self, item):
+        node = self.nodes.get(item)
+        if node:
+            node.count -= 1
+            if node.count == 0:  # Remove item entirely if quantity is zero
+                self._unlink(node)
+                del self.nodes[item]
+            self.summary.remove(item)
+
+    def move_to_end(self, item):
+        """
+        Mark item as the most recently used one.
+        """
+        node = self.nodes[item]
+        if node is not self.tail:
+            self._unlink(node)
+            self._link_last(node)
+
+    def at(self, index):
+        """
+        Return the (item, count) pair at position index, walking from the nearer end.
+        """
+        if index < 0:
+            index += len(self.nodes)
+        if not 0 <= index < len(self.nodes):
+            raise IndexError("cart index out of range")
+        if index < len(self.nodes) // 2:
+            node = self.head
+            for _ in range(index):
+                node = node.next
+        else:
+            node = self.tail
+            for _ in range(len(self.nodes) - 1 - index):
+                node = node.prev
+        return node.item, node.count
+
+    def _link_last(self, node):
+        node.prev = self.tail
+        node.next = None
+        if self.tail is None:
+            self.head = node
+        else:
+            self.tail.next = node
+        self.tail = node
+
+    def _unlink(self, node):
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is None:
+            self.tail = node.prev
+        else:
+            node.next.prev = node.prev
+
+    def __str__(self):
+        return ", ".join(f"{item} x{count}" for item, count in self)
+
+
+class CartNode:
+    __slots__ = ("item", "prev", "next")
+
+    def __init__(self, item):
+        self.item = item
+        self.prev = None
+        self.next = None
+
+
+class CartList:
+    """
+    Doubly linked list of cart items in the order they were added, with a
+    hash index from item name to its nodes so that membership tests and
+    removals are O(1).
+    """
+    def __init__(self):
+        self.head = None
+        self.tail = None
+        self.nodes_by_item = {}  # item -> deque of its nodes, oldest first
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, item):
+        return item in self.nodes_by_item
+
+    def __iter__(self):
+        for node in self.nodes():
+            yield node.item
+
+    def nodes(self):
+        node = self.head
+        while node is not None:
+            yield node
+            node = node.next
+
+    def count(self, item):
+        return len(self.nodes_by_item.get(item, ()))
+
+    @timed("cart list append")
+    def append(self, item):
+        node = CartNode(item)
+        if self.tail is None:
+            self.head = node
+        else:
+            self.tail.next = node
+            node.prev = self.tail
+        self.tail = node
+        self.nodes_by_item.setdefault(item, deque()).append(node)
+        self.size += 1
+        return node
+
+    @timed("cart list remove")
+    def remove(self, item):
+        """
+        Remove the oldest occurrence of item, like list.remove, and return its node.
+        The node keeps its own links so the caller can tell where it was.
+        """
+        nodes = self.nodes_by_item.get(item)
+        if not nodes:
+            raise ValueError(f"{item!r} not in cart")
+        node = nodes.popleft()
+        if not nodes:
+            del self.nodes_by_item[item]
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is None:
+            self.tail = node.prev
+        else:
+            node.next.prev = node.prev
+        self.size -= 1
+        return node
+
+
+class CartSnapshot:
+    """
+    The items of a LifoCart at one moment, oldest first like the cart.
+    It holds the top node of the cart's stack, which later adds and
+    processes never change, so it stays the same while the cart moves on.
+    """
+    __slots__ = ("top",)
+
+    def __init__(self, top):
+        self.top = top
+
+    def __len__(self):
+        return self.top[2] if self.top is not None else 0
+
+    def __iter__(self):
+        return reversed(self.newest(len(self)))
+
+    def __reversed__(self):
+        node = self.top
+        while node is not None:
+            yield node[0]
+            node = node[1]
+
+    def newest(self, limit):
+        """
+        Up to limit items, most recent first, walking only that far down.
+        """
+        found = []
+        node = self.top
+        while node is not None and len(found) < limit:
+            found.append(node[0])
+            node = node[1]
+        return found
+
+
+class LifoCart:
+    """
+    Items processed last-in, first-out, with a log of every
+    ("Add"/"Process", item) action in `history` and running totals in `summary`.
+
+    Items are kept in a persistent stack: `top` is an (item, node below,
+    depth) tuple that is never modified, so add and process only make or
+    drop the top node, and snapshot() is O(1) however large the cart is.
+    Reading a snapshot needs no lock, even while another thread changes
+    the cart, and nodes no snapshot refers to any more are freed by
+    reference counting as usual. `history` only grows, so a prefix of it
+    is safe to read the same way; trim_history() puts a new, shorter list
+    in its place rather than changing the old one.
+    """
+    def __init__(self):
+        self.top = None
+        self.history = []
+        self.history_start = 0  # Actions dropped from the front of history by trim_history()
+        self.summary = CartSummary()
+
+    def __len__(self):
+        top = self.top
+        return top[2] if top is not None else 0
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def snapshot(self):
+        return CartSnapshot(self.top)
+
+    @property
+    def action_count(self):
+        """
+        Actions since the cart was made, including those trimmed from history.
+        """
+        return self.history_start + len(self.history)
+
+    def trim_history(self, keep):
+        """
+        Keep only the last keep entries of history, once older ones are
+        stored elsewhere (see shopping_core.archive).
+        """
+        drop = len(self.history) - keep
+        if drop > 0:
+            self.history = self.history[drop:]
+            self.history_start += drop
+
+    @timed("stack add")
+    def add(self, item):
+        top = self.top
+        self.top = (item, top, top[2] + 1 if top is not None else 1)
+        self.history.append(("Add", item))
+        self.summary.add(item)
+
+    @timed("stack process")
+    def process(self):
+        """
+        Remove and return the most recently added item, or None if the cart is empty.
+        """
+        if self.top is None:
+            return None
+        item, self.top, _ = self.top
+        self.history.append(("Process", item))
+        self.summary.remove(item)
+        return item
+
+    @timed("stack process_many")
+    def process_many(self, limit):
+        """
+        Process up to limit items, most recent first, and return them in that order.
+        """
+        processed = []
+        node = self.top
+        while node is not None and len(processed) < limit:
+            processed.append(node[0])
+            node = node[1]
+        self.top = node
+        self.history.extend(("Process", item) for item in processed)
+        for item in processed:
+            self.summary.remove(item)
+        return processed
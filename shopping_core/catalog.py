@@ -0,0 +1,218 @@
+"""
+Category hierarchy for the Treeview in topic2.PY, topic5.py and topic6.py.
+
+A catalog file has one path per line, parts separated by "/":
+
+    Groceries/Fruits/Apples
+    Groceries/Fruits/Bananas
+    Electronics/Phones
+
+Parent categories are created the first time they appear. Every node gets
+an integer ID (0 is the invisible root) and the index maps each node to
+its children, so the Treeview can insert one level at a time.
+
+Catalog holds the whole hierarchy in memory, which for a large catalog
+costs seconds and tens of megabytes at startup. CatalogFile answers the
+same questions from `<path>.index`, a table of fixed-size node records
+followed by the names, memory-mapped so that only the pages the Treeview
+reads are loaded. The index is written the first time a catalog file is
+opened and again whenever the file changes; after that, opening a catalog
+takes the same time and memory whatever its size.
+"""
+import mmap
+import os
+import struct
+from collections import deque
+
+
+class Catalog:
+    ROOT = 0
+
+    def __init__(self):
+        self.names = [""]
+        self.parents = [-1]
+        self.child_ids = {}  # node -> list of child nodes, in file order
+
+    def __len__(self):
+        return len(self.names) - 1
+
+    @classmethod
+    def from_lines(cls, lines):
+        catalog = cls()
+        lookup = {}  # (parent, name) -> node, only needed while loading
+        for line in lines:
+            node = cls.ROOT
+            for part in line.split("/"):
+                part = part.strip()
+                if not part:
+                    continue
+                child = lookup.get((node, part))
+                if child is None:
+                    child = lookup[(node, part)] = catalog.add(node, part)
+                node = child
+        return catalog
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as lines:
+            return cls.from_lines(lines)
+
+    def add(self, parent, name):
+        node = len(self.names)
+        self.names.append(name)
+        self.parents.append(parent)
+        self.child_ids.setdefault(parent, []).append(node)
+        return node
+
+    def name(self, node):
+        return self.names[node]
+
+    def children(self, node):
+        return self.child_ids.get(node, ())
+
+    def has_children(self, node):
+        return node in self.child_ids
+
+    def parent(self, node):
+        return self.parents[node]
+
+    def path(self, node):
+        parts = []
+        while node != self.ROOT:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return "/".join(reversed(parts))
+
+
+# Index file: header, one record per node in ID order, then the UTF-8 names.
+# The header holds the catalog file's size and modification time, to tell
+# when the index is out of date.
+INDEX_HEADER = struct.Struct("<8sQqI")  # Magic, catalog size, catalog mtime_ns, nodes
+INDEX_MAGIC = b"CATIDX01"
+# Parent, first child, child count, name offset into the names, name length
+INDEX_RECORD = struct.Struct("<IIIQI")
+
+
+def write_index(catalog, path, size, mtime_ns):
+    """
+    Write the index of an in-memory Catalog to path. Nodes are numbered
+    again breadth first, so the children of every node get consecutive IDs
+    and a record needs only the first one and a count.
+    """
+    order = [catalog.ROOT]  # Old ID of each new ID
+    new_ids = {catalog.ROOT: 0}
+    first_child = [0]
+    queue = deque([catalog.ROOT])
+    while queue:
+        node = queue.popleft()
+        first_child[new_ids[node]] = len(order)
+        for child in catalog.children(node):
+            new_ids[child] = len(order)
+            order.append(child)
+            first_child.append(0)
+            queue.append(child)
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as index:
+        index.write(INDEX_HEADER.pack(INDEX_MAGIC, size, mtime_ns, len(order)))
+        offset = 0
+        encoded = []
+        for new_id, node in enumerate(order):
+            name = catalog.name(node).encode("utf-8")
+            parent = catalog.parent(node)
+            index.write(INDEX_RECORD.pack(new_ids[parent] if parent >= 0 else 0, first_child[new_id],
+                                          len(catalog.children(node)), offset, len(name)))
+            encoded.append(name)
+            offset += len(name)
+        index.write(b"".join(encoded))
+    os.replace(temporary, path)
+
+
+class CatalogNames:
+    """
+    The names of a CatalogFile as a read-only sequence indexed by node ID,
+    for SearchIndex.
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def __len__(self):
+        return self.catalog.count
+
+    def __getitem__(self, node):
+        if not 0 <= node < self.catalog.count:
+            raise IndexError("catalog node out of range")
+        return self.catalog.name(node)
+
+    def __iter__(self):
+        for node in range(self.catalog.count):
+            yield self.catalog.name(node)
+
+
+class CatalogFile:
+    """
+    A catalog read from its index file on demand, with the methods of
+    Catalog. Nothing is read at startup beyond the header; children() reads
+    one record per child. Safe to read from several threads.
+    """
+    ROOT = 0
+
+    def __init__(self, index_path):
+        with open(index_path, "rb") as index:
+            self.map = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, _, self.count = INDEX_HEADER.unpack_from(self.map, 0)
+        self.names_start = INDEX_HEADER.size + self.count * INDEX_RECORD.size
+        self.names = CatalogNames(self)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Open the catalog file at path, writing its index first if it is
+        missing or older than the file.
+        """
+        index_path = path + ".index"
+        status = os.stat(path)
+        if not cls.index_matches(index_path, status):
+            write_index(Catalog.from_file(path), index_path, status.st_size, status.st_mtime_ns)
+        return cls(index_path)
+
+    @staticmethod
+    def index_matches(index_path, status):
+        try:
+            with open(index_path, "rb") as index:
+                header = index.read(INDEX_HEADER.size)
+        except FileNotFoundError:
+            return False
+        return (len(header) == INDEX_HEADER.size
+                and INDEX_HEADER.unpack(header)[:3] == (INDEX_MAGIC, status.st_size, status.st_mtime_ns))
+
+    def __len__(self):
+        return self.count - 1
+
+    def record(self, node):
+        return INDEX_RECORD.unpack_from(self.map, INDEX_HEADER.size + node * INDEX_RECORD.size)
+
+    def name(self, node):
+        _, _, _, offset, length = self.record(node)
+        start = self.names_start + offset
+        return self.map[start:start + length].decode("utf-8")
+
+    def parent(self, node):
+        return self.record(node)[0] if node != self.ROOT else -1
+
+    def children(self, node):
+        _, first, count, _, _ = self.record(node)
+        return range(first, first + count)
+
+    def has_children(self, node):
+        return self.record(node)[2] > 0
+
+    def path(self, node):
+        parts = []
+        while node != self.ROOT:
+            parts.append(self.name(node))
+            node = self.parent(node)
+        return "/".join(reversed(parts))
+
+    def close(self):
+        self.map.close()
@@ -0,0 +1,133 @@
+"""
+"Often bought with" suggestions for the carts of topic2.PY, topic5.py and
+topic6.py, learned as items are added.
+
+Every add counts the new item together with each item already in the cart,
+both ways round. Pair counts go into a count-min sketch, so their memory is
+fixed however many pairs turn up; each item also keeps its `top_k` partners
+with the highest estimated counts, so a suggestion is a lookup in a dict of
+top_k entries instead of a scan of the history.
+
+Estimates only ever overcount. The count-min bound is e * N / width,
+N being all pair counts so far, for 98% of pairs at depth 4; conservative
+update keeps the error well under that in practice.
+"""
+from array import array
+from itertools import islice
+
+from shopping_core.instrument import timed
+
+
+class CountMinSketch:
+    """
+    Approximate counts of hashable keys in depth rows of width counters.
+    A key maps to one counter per row; its estimate is the smallest of them.
+    """
+    def __init__(self, width=1 << 16, depth=4):
+        self.width = width
+        self.depth = depth
+        self.counters = array("I", bytes(4 * width * depth))
+        self.rows = [(row, row * width) for row in range(depth)]  # Row and its first counter
+
+    def positions(self, key):
+        # Double hashing: row i uses h1 + i * h2, from a single hash of the key
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width = self.width
+        return [start + (h1 + row * h2) % width for row, start in self.rows]
+
+    def estimate(self, key):
+        counters = self.counters
+        return min(counters[position] for position in self.positions(key))
+
+    def add(self, key, count=1):
+        """
+        Count key and return its new estimate. Conservative update: only
+        the counters below the new estimate are raised.
+        """
+        counters = self.counters
+        positions = self.positions(key)
+        values = [counters[position] for position in positions]
+        estimate = min(values) + count
+        for position, value in zip(positions, values):
+            if value < estimate:
+                counters[position] = estimate
+        return estimate
+
+
+class CoPurchaseIndex:
+    """
+    Items bought together, from a stream of adds. add(item, basket) takes
+    the items already in the cart, most recent first; they may repeat, as
+    in reversed(cart.snapshot()). Only the first `basket_limit` distinct
+    items among the first 4 * basket_limit are counted, which bounds the
+    cost of an add.
+    """
+    def __init__(self, top_k=10, width=1 << 16, depth=4, basket_limit=20):
+        self.top_k = top_k
+        self.basket_limit = basket_limit
+        self.sketch = CountMinSketch(width, depth)
+        self.partners = {}  # item -> {partner: estimated count}, at most top_k entries
+
+    def __len__(self):
+        return len(self.partners)
+
+    @timed("copurchase add")
+    def add(self, item, basket):
+        seen = {item}
+        for other in islice(basket, 4 * self.basket_limit):
+            if other not in seen:
+                seen.add(other)
+                self._count(item, other)
+                self._count(other, item)
+                if len(seen) > self.basket_limit:
+                    break
+
+    def _count(self, item, partner):
+        estimate = self.sketch.add((item, partner))
+        top = self.partners.get(item)
+        if top is None:
+            top = self.partners[item] = {}
+        if partner in top or len(top) < self.top_k:
+            top[partner] = estimate
+            return
+        weakest = min(top, key=top.get)
+        if estimate > top[weakest]:
+            del top[weakest]
+            top[partner] = estimate
+
+    def learn(self, history, limit=10_000):
+        """
+        Replay the last `limit` entries of a cart history of ("Add", item)
+        and ("Process"/"Remove", item) entries, tracking what was in the
+        cart at each add, by their last add. An add costs up to
+        2 * basket_limit sketch updates, so a whole long history would take
+        minutes.
+        """
+        in_cart = {}  # item -> quantity, least recently added first
+        for action, item in history[max(0, len(history) - limit):]:
+            if action == "Add":
+                self.add(item, reversed(in_cart))
+                in_cart[item] = in_cart.pop(item, 0) + 1  # Moves it to the end
+            elif in_cart.get(item, 0) > 1:
+                in_cart[item] -= 1
+            else:
+                in_cart.pop(item, None)
+
+    def suggest(self, item, n=5):
+        """
+        Up to n (partner, estimated count) pairs, most often bought with item first.
+        """
+        top = self.partners.get(item)
+        if not top:
+            return []
+        return sorted(top.items(), key=lambda pair: pair[1], reverse=True)[:n]
+
+    def text(self, item, n=3):
+        """
+        One line for the suggestion label.
+        """
+        found = self.suggest(item, n)
+        if not found:
+            return f"No purchases with {item} yet"
+        return f"Often bought with {item}: " + ", ".join(partner for partner, _ in found)
@@ -0,0 +1,207 @@
+"""
+Undo/redo for the stack-based shopping assistant (topic4.py).
+"""
+from bisect import bisect_left, bisect_right
+
+from shopping_core.cart import CartList
+from shopping_core.instrument import timed
+
+
+class UndoRedoCart:
+    """
+    A CartList whose add and remove actions can be undone and redone.
+
+    Every action moves the cart to a new version. The history is a timeline
+    of runs, [action, item, count], so 500 "add Milk" in a row take one
+    entry; actions after the current version are the ones redo can replay.
+    Every `checkpoint_every` versions a copy of the cart is kept, which lets
+    jump_to() rebuild any version from the nearest checkpoint instead of
+    undoing one action at a time. Once runs plus checkpointed items exceed
+    `max_entries`, the oldest history up to a checkpoint is dropped.
+
+    If a listener is given, its on_append(node) and on_remove(node) are
+    called for every node the cart gains or loses, so a view can update
+    only the rows that changed; on_reset() is called after jump_to().
+    """
+    def __init__(self, listener=None, max_entries=100_000, checkpoint_every=1_000):
+        self.items = CartList()
+        self.listener = listener
+        self.max_entries = max_entries
+        self.checkpoint_every = checkpoint_every
+        self.runs = []  # [action, item, count], oldest first
+        self.ends = []  # Version reached at the end of each run
+        self.base = 0  # Oldest version still reachable
+        self.version = 0
+        self.checkpoints = {0: ()}  # version -> cart items at that version
+        self.checkpoint_versions = [0]
+        self.entry_count = 0  # Runs plus items held in checkpoints
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def latest(self):
+        """
+        The newest version, reached by redoing everything.
+        """
+        return self.ends[-1] if self.ends else self.base
+
+    @timed("undo cart add")
+    def add(self, item):
+        self._append(item)
+        self._record("add", item)
+
+    @timed("undo cart remove")
+    def remove(self, item):
+        """
+        Remove the oldest occurrence of item. Returns False if it is not in the cart.
+        """
+        if item not in self.items:
+            return False
+        self._remove(item)
+        self._record("remove", item)
+        return True
+
+    @timed("undo cart undo")
+    def undo(self):
+        """
+        Undo the last action and return it as (action, item), or None if there is none.
+        """
+        if self.version == self.base:
+            return None
+        action, item, _ = self.runs[bisect_left(self.ends, self.version)]
+        if action == "add":
+            self._remove(item)
+        elif action == "remove":
+            self._append(item)
+        self.version -= 1
+        return action, item
+
+    @timed("undo cart redo")
+    def redo(self):
+        """
+        Redo the last undone action and return it as (action, item), or None if there is none.
+        """
+        if self.version == self.latest:
+            return None
+        action, item, _ = self.runs[bisect_left(self.ends, self.version + 1)]
+        self._apply(action, item)
+        self.version += 1
+        return action, item
+
+    def jump_to(self, version):
+        """
+        Rebuild the cart as it was at version, which must lie between base and latest.
+        The cart is restored from the nearest checkpoint and replayed forward.
+        It holds the same items as stepping there with undo/redo would, but
+        an item whose removal was undone may be in a different row, since
+        undo puts it back at the end.
+        """
+        if not self.base <= version <= self.latest:
+            raise ValueError(f"version {version} is not between {self.base} and {self.latest}")
+        start = self.checkpoint_versions[bisect_right(self.checkpoint_versions, version) - 1]
+        listener, self.listener = self.listener, None  # One on_reset instead of a call per node
+        self.items = CartList()
+        for item in self.checkpoints[start]:
+            self.items.append(item)
+        self._replay(start, version)
+        self.version = version
+        self.listener = listener
+        if listener:
+            listener.on_reset()
+
+    def _replay(self, start, stop):
+        """
+        Apply the actions that lead from version start to version stop.
+        """
+        index = bisect_right(self.ends, start)
+        while start < stop:
+            action, item, count = self.runs[index]
+            steps = min(self.ends[index], stop) - start
+            for _ in range(steps):
+                self._apply(action, item)
+            start += steps
+            index += 1
+
+    def _record(self, action, item):
+        if self.version < self.latest:
+            self._truncate()
+        if self.runs and self.runs[-1][0] == action and self.runs[-1][1] == item:
+            self.runs[-1][2] += 1
+            self.ends[-1] += 1
+        else:
+            self.runs.append([action, item, 1])
+            self.ends.append(self.version + 1)
+            self.entry_count += 1
+        self.version += 1
+        if self.version % self.checkpoint_every == 0:
+            snapshot = tuple(self.items)
+            self.checkpoints[self.version] = snapshot
+            self.checkpoint_versions.append(self.version)
+            self.entry_count += len(snapshot)
+        if self.entry_count > self.max_entries:
+            self._drop_oldest()
+
+    def _truncate(self):
+        """
+        Forget the actions after the current version; a new action replaces them.
+        """
+        index = bisect_left(self.ends, self.version)
+        if index < len(self.runs) and self.ends[index] > self.version:
+            self.runs[index][2] -= self.ends[index] - self.version
+            self.ends[index] = self.version
+            if self.runs[index][2] == 0:
+                index -= 1
+        self.entry_count -= len(self.runs) - (index + 1)
+        del self.runs[index + 1:]
+        del self.ends[index + 1:]
+        while self.checkpoint_versions[-1] > self.version:
+            self.entry_count -= len(self.checkpoints.pop(self.checkpoint_versions.pop()))
+
+    def _drop_oldest(self):
+        """
+        Move the base up to the oldest checkpoint that brings the entry count
+        within max_entries, dropping the runs and checkpoints before it.
+        """
+        dropped = 0
+        cut = 0
+        while cut + 1 < len(self.checkpoint_versions):
+            dropped += len(self.checkpoints[self.checkpoint_versions[cut]])
+            cut += 1
+            runs_before = bisect_right(self.ends, self.checkpoint_versions[cut])
+            if self.entry_count - dropped - runs_before <= self.max_entries:
+                break
+        if cut == 0:
+            return
+        self.base = self.checkpoint_versions[cut]
+        for version in self.checkpoint_versions[:cut]:
+            del self.checkpoints[version]
+        del self.checkpoint_versions[:cut]
+        first = bisect_right(self.ends, self.base)  # Runs ending at or before base go
+        if first < len(self.runs):  # The next run may have started before base
+            self.runs[first][2] = min(self.runs[first][2], self.ends[first] - self.base)
+        self.entry_count -= dropped + first
+        del self.runs[:first]
+        del self.ends[:first]
+
+    def _apply(self, action, item):
+        if action == "add":
+            self._append(item)
+        elif action == "remove":
+            self._remove(item)
+
+    def _append(self, item):
+        node = self.items.append(item)
+        if self.listener:
+            self.listener.on_append(node)
+
+    def _remove(self, item):
+        node = self.items.remove(item)
+        if self.listener:
+            self.listener.on_remove(node)
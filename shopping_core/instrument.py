@@ -0,0 +1,148 @@
+"""
+Opt-in timing of cart, queue, sort and widget operations.
+
+Set SHOPPING_PROFILE before starting an app or benchmark:
+
+    SHOPPING_PROFILE=1 python topic6.py              # live stats window
+    SHOPPING_PROFILE=stats.json python topic3.py     # also written to stats.json on exit
+
+Functions are marked with @timed(name, kind). When SHOPPING_PROFILE is not
+set the decorator hands back the function itself, so a disabled build runs
+exactly the code it would without instrumentation. The setting is read once
+at import time.
+
+Kinds separate where the time goes:
+    ACTION - a whole button handler, data and widget work together
+    DATA   - a shopping_core data structure operation
+    WIDGET - Python code updating Tk widgets; with a redraw function, the
+             Tk redraw that follows is timed too, as "<name> redraw"
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+ACTION = "action"
+DATA = "data"
+WIDGET = "widget"
+
+SETTING = os.environ.get("SHOPPING_PROFILE", "")
+ENABLED = bool(SETTING)
+DUMP_PATH = SETTING if SETTING not in ("", "1") else None
+
+BUCKETS = 32  # Bucket b counts calls that took under 2**b microseconds
+
+
+class OperationStats:
+    __slots__ = ("kind", "count", "total", "longest", "buckets")
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.count = 0
+        self.total = 0  # Nanoseconds
+        self.longest = 0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, nanoseconds):
+        self.count += 1
+        self.total += nanoseconds
+        self.longest = max(self.longest, nanoseconds)
+        self.buckets[min((nanoseconds // 1000).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, percent):
+        """
+        Upper bound in microseconds of the bucket holding that percentile.
+        """
+        rank = self.count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return 2 ** bucket
+        return 0
+
+    def summary(self):
+        return {"kind": self.kind, "count": self.count,
+                "mean_us": self.total / self.count / 1000 if self.count else 0.0,
+                "p50_us": self.percentile(50), "p99_us": self.percentile(99),
+                "max_us": self.longest / 1000, "histogram": self.buckets}
+
+
+operations = {}  # name -> OperationStats
+lock = threading.Lock()
+
+
+def record(name, kind, nanoseconds):
+    with lock:
+        stats = operations.get(name)
+        if stats is None:
+            stats = operations[name] = OperationStats(kind)
+        stats.add(nanoseconds)
+
+
+def timed(name, kind=DATA, redraw=None):
+    """
+    Decorator recording the calls of a function under name. redraw(*args)
+    may return the Tk widget to flush with update_idletasks() after a
+    WIDGET call, so the redraw Tk would do later is timed separately.
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter_ns()
+                record(name, kind, end - start)
+                if redraw is not None:
+                    redraw(*args).update_idletasks()
+                    record(f"{name} redraw", WIDGET, time.perf_counter_ns() - end)
+        return wrapper
+    return decorate
+
+
+def app_root(app, *args):
+    """
+    redraw function for methods of the Tk apps, which keep their window in root.
+    """
+    return app.root
+
+
+def snapshot():
+    """
+    {name: summary} for every operation recorded so far.
+    """
+    with lock:
+        return {name: stats.summary() for name, stats in sorted(operations.items())}
+
+
+def totals_by_kind():
+    """
+    Total milliseconds spent per kind. A timed call inside another is
+    counted in both, so ACTION includes the DATA and WIDGET time below it.
+    """
+    totals = {}
+    with lock:
+        for stats in operations.values():
+            totals[stats.kind] = totals.get(stats.kind, 0) + stats.total / 1e6
+    return totals
+
+
+def dump(path):
+    with open(path, "w", encoding="utf-8") as out:
+        json.dump({"operations": snapshot(), "total_ms_by_kind": totals_by_kind()}, out, indent=2)
+
+
+def reset():
+    with lock:
+        operations.clear()
+
+
+if DUMP_PATH:
+    atexit.register(dump, DUMP_PATH)
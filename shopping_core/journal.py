@@ -0,0 +1,254 @@
+"""
+Write-ahead journal for the carts of topic2.PY, topic5.py and topic6.py.
+
+Every cart operation is appended to `<path>` as a compact binary record:
+one byte for the operation, two bytes for the length of the item name and
+the UTF-8 name itself. Records are buffered and written with a single
+fsync per group (every `group_size` records or `group_interval` seconds,
+whichever comes first), so a crash loses at most one group.
+
+compact() writes the current cart contents to `<path>.snapshot` and
+empties the log; close() does so by itself once the log holds more than
+`compact_after` records. Recovery replays the snapshot and then the log.
+A record cut short by a crash, or one that does not decode, ends the log
+and is trimmed off.
+
+Both files start with a GENERATION record. The log's says which log it
+is; the snapshot's says the last log it covers. compact() publishes the
+snapshot before it empties the log, so after a crash between the two,
+recovery finds a log the snapshot already covers and skips it instead of
+replaying it on top.
+"""
+import os
+import struct
+import threading
+
+ADD = 1
+REMOVE = 2
+PROCESS = 3
+GENERATION = 4  # First record of the log and the snapshot, see the module docstring
+OPERATIONS = (ADD, REMOVE, PROCESS, GENERATION)
+
+HEADER = struct.Struct("<BH")  # Operation, length of the item name in bytes
+MAX_NAME_BYTES = 0xFFFF
+
+
+def encode(op, item=""):
+    data = item.encode("utf-8")
+    if len(data) > MAX_NAME_BYTES:
+        raise ValueError(f"item name is {len(data)} bytes; the journal takes at most {MAX_NAME_BYTES}")
+    return HEADER.pack(op, len(data)) + data
+
+
+def iter_records(path):
+    """
+    Yield (op, item, byte offset after the record) for every complete
+    record, reading the file as it goes. Stops at a torn record, one
+    that does not decode or an unknown operation.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as log:
+        offset = 0
+        while True:
+            header = log.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            op, length = HEADER.unpack(header)
+            data = log.read(length)
+            if len(data) < length or op not in OPERATIONS:
+                return
+            try:
+                item = data.decode("utf-8")
+            except UnicodeDecodeError:
+                return
+            offset += HEADER.size + length
+            yield op, item, offset
+
+
+def read_records(path):
+    """
+    Return ([(op, item), ...], byte offset after the last good record).
+    """
+    records = []
+    offset = 0
+    for op, item, offset in iter_records(path):
+        records.append((op, item))
+    return records, offset
+
+
+def scan(path):
+    """
+    (generation, records after it, byte offset after the last good record)
+    without keeping the records. Files from before generations count as
+    generation -1.
+    """
+    generation, count, offset = -1, 0, 0
+    for op, item, offset in iter_records(path):
+        if op == GENERATION and count == 0 and generation == -1:
+            generation = int(item)
+        else:
+            count += 1
+    return generation, count, offset
+
+
+def fsync_directory(path):
+    """
+    Make a rename in the directory of path durable, where the platform allows it.
+    """
+    if hasattr(os, "O_DIRECTORY"):
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+class CartJournal:
+    def __init__(self, path, group_size=256, group_interval=0.05, compact_after=1_000_000):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.compact_after = compact_after
+        self.log_records = 0  # Records in the log since the last snapshot
+        self.generation = 0  # Generation of the log
+        self.replay_log = True  # False when the snapshot already covers the log
+        self.lock = threading.Lock()
+        self.pending = []  # Encoded records not yet written
+        self.log = None
+        self.closed = threading.Event()
+        self.flusher = None
+
+    def open(self):
+        """
+        Open the log for appending, after trimming any torn record. A log the
+        snapshot already covers, left by a crash during compact(), is emptied.
+        """
+        covered, _, _ = scan(self.snapshot_path)
+        generation, count, valid_size = scan(self.path)
+        self.log = open(self.path, "ab")
+        self.replay_log = generation == -1 or generation > covered
+        if not self.replay_log or (generation == -1 and valid_size == 0):
+            # Stale or new: start the log after the snapshot's generation
+            self.replay_log = False
+            self._start_log(covered + 1)
+        else:
+            if self.log.tell() != valid_size:
+                self.log.truncate(valid_size)
+            self.generation = max(generation, 0)
+            self.log_records = count
+        self.flusher = threading.Thread(target=self.flush_periodically, daemon=True)
+        self.flusher.start()
+
+    def records(self):
+        """
+        Yield the (op, item) records to replay: the snapshot, then the log.
+        """
+        paths = [self.snapshot_path] + ([self.path] if self.replay_log else [])
+        for path in paths:
+            for op, item, _ in iter_records(path):
+                if op != GENERATION:
+                    yield op, item
+
+    def recover(self):
+        """
+        Open the log and return the list of records to replay.
+        """
+        self.open()
+        return list(self.records())
+
+    def replay_into(self, cart):
+        """
+        Open the log and apply every record to a DoublyLinkedList or LifoCart,
+        streaming them from disk. Returns the number of records replayed.
+        """
+        self.open()
+        count = 0
+        for op, item in self.records():
+            if op == ADD:
+                cart.add(item)
+            elif op == REMOVE:
+                cart.remove(item)
+            elif op == PROCESS:
+                cart.process()
+            count += 1
+        return count
+
+    def _start_log(self, generation):
+        """
+        Empty the log and begin it with its generation record, durably.
+        """
+        self.log.truncate(0)
+        self.log.seek(0)
+        self.log.write(encode(GENERATION, str(generation)))
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        self.generation = generation
+        self.log_records = 0
+
+    def append(self, op, item=""):
+        with self.lock:
+            self.pending.append(encode(op, item))
+            self.log_records += 1
+            if len(self.pending) >= self.group_size:
+                self._commit()
+
+    def commit(self):
+        with self.lock:
+            self._commit()
+
+    def _commit(self):
+        if not self.pending:
+            return
+        self.log.write(b"".join(self.pending))
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        self.pending = []
+
+    def flush_periodically(self):
+        while not self.closed.wait(self.group_interval):
+            self.commit()
+
+    def compact(self, items):
+        """
+        Replace the snapshot with `items` (the cart contents, replayed as
+        adds) and empty the log. The snapshot is written to a temporary
+        file first, so a crash leaves either the old or the new one; the new
+        one records that it covers this log's generation.
+        """
+        with self.lock:
+            self._commit()
+            temporary = self.snapshot_path + ".tmp"
+            with open(temporary, "wb") as snapshot:
+                snapshot.write(encode(GENERATION, str(self.generation)))
+                snapshot.write(b"".join(encode(ADD, item) for item in items))
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary, self.snapshot_path)
+            fsync_directory(self.snapshot_path)
+            self._start_log(self.generation + 1)
+
+    def close(self, items=None):
+        """
+        Flush and close the log. If the cart contents are passed in and the
+        log has grown past compact_after records, compact it first.
+        """
+        self.closed.set()
+        if self.flusher:
+            self.flusher.join()
+        if items is not None and self.log_records > self.compact_after:
+            self.compact(items)
+        with self.lock:
+            self._commit()
+            self.log.close()
+
+
+def expand_counts(cart):
+    """
+    Items of a DoublyLinkedList repeated by quantity, for compact().
+    """
+    for item, count in cart:
+        for _ in range(count):
+            yield item
+
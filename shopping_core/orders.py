@@ -0,0 +1,517 @@
+"""
+Order queues for the circular-queue shopping assistant (topic3.py).
+"""
+import heapq
+import logging
+import queue
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from operator import attrgetter
+
+from shopping_core.instrument import timed
+
+PRICE = re.compile(r"(\d+)(?:\.(\d{1,2}))?")  # Dollars, optionally with cents
+log = logging.getLogger(__name__)
+
+MAX_SHARED_NAMES = 10_000  # Item names OrderIntake keeps for sharing, least recently ordered dropped first
+
+
+class CircularQueue:
+    """
+    Fixed-size ring buffer of orders. With growable=True a full queue doubles
+    its capacity instead of rejecting new items; the ring order is kept.
+    """
+    def __init__(self, capacity, growable=False):
+        self.capacity = capacity
+        self.growable = growable
+        self.queue = [None] * capacity
+        self.front = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for offset in range(self.count):
+            yield self.queue[(self.front + offset) % self.capacity]
+
+    def get(self, index):
+        """
+        Return the item at position index counted from the front.
+        """
+        return self.queue[(self.front + index) % self.capacity]
+
+    def is_full(self):
+        return self.count == self.capacity
+
+    def is_empty(self):
+        return self.count == 0
+
+    @timed("queue enqueue")
+    def enqueue(self, item):
+        if self.is_full():
+            if not self.growable:
+                return False  # Queue is full
+            self.grow(self.capacity * 2)
+        self.queue[(self.front + self.count) % self.capacity] = item
+        self.count += 1
+        return True
+
+    @timed("queue dequeue")
+    def dequeue(self):
+        if self.is_empty():
+            return None  # Queue is empty
+        item = self.queue[self.front]
+        self.queue[self.front] = None
+        self.front = (self.front + 1) % self.capacity
+        self.count -= 1
+        return item
+
+    def enqueue_many(self, items):
+        """
+        Add items in order and return how many were accepted. A growable queue
+        resizes at most once; a fixed one stops when it is full.
+        """
+        items = list(items)
+        if self.growable and self.count + len(items) > self.capacity:
+            self.grow(max(self.capacity * 2, self.count + len(items)))
+        items = items[:self.capacity - self.count]
+        start = (self.front + self.count) % self.capacity
+        first = min(len(items), self.capacity - start)  # Slots before the end of the ring
+        self.queue[start:start + first] = items[:first]
+        self.queue[:len(items) - first] = items[first:]
+        self.count += len(items)
+        return len(items)
+
+    def dequeue_many(self, limit):
+        """
+        Remove and return up to limit items from the front.
+        """
+        taken = min(limit, self.count)
+        first = min(taken, self.capacity - self.front)
+        items = self.queue[self.front:self.front + first] + self.queue[:taken - first]
+        self.queue[self.front:self.front + first] = [None] * first
+        self.queue[:taken - first] = [None] * (taken - first)
+        self.front = (self.front + taken) % self.capacity
+        self.count -= taken
+        return items
+
+    def grow(self, capacity):
+        """
+        Move the items, front first, into a larger ring.
+        """
+        items = self.ordered_slots()
+        self.queue = items + [None] * (capacity - len(items))
+        self.capacity = capacity
+        self.front = 0
+
+    def ordered_slots(self):
+        end = self.front + self.count
+        if end <= self.capacity:
+            return self.queue[self.front:end]
+        return self.queue[self.front:] + self.queue[:end - self.capacity]
+
+    def display(self):
+        return self.ordered_slots()
+
+
+class BlockingCircularQueue(CircularQueue):
+    """
+    CircularQueue shared by several producer and consumer threads.
+    put() waits while a fixed-size queue is full, which pushes back on the
+    producers, and take() waits while it is empty; both give up after
+    timeout seconds. Each slot holds (enqueue time, item) so take() can
+    report how long the item waited; the other methods return plain items.
+    """
+    def __init__(self, capacity, growable=False):
+        super().__init__(capacity, growable)
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+
+    def __iter__(self):
+        for entry in super().__iter__():
+            yield entry[1]
+
+    def get(self, index):
+        with self.lock:
+            entry = super().get(index) if index < self.count else None  # Workers may have drained it
+        return entry[1] if entry else None
+
+    def display(self):
+        with self.lock:
+            return [entry[1] for entry in self.ordered_slots()]
+
+    def enqueue(self, item):
+        with self.lock:
+            added = super().enqueue((time.perf_counter(), item))
+            if added:
+                self.not_empty.notify()
+            return added
+
+    def dequeue(self):
+        with self.lock:
+            entry = super().dequeue()
+            if entry is None:
+                return None
+            self.not_full.notify()
+            return entry[1]
+
+    def enqueue_many(self, items):
+        now = time.perf_counter()
+        with self.lock:
+            added = super().enqueue_many([(now, item) for item in items])
+            self.not_empty.notify(added)
+            return added
+
+    def dequeue_many(self, limit):
+        with self.lock:
+            entries = super().dequeue_many(limit)
+            self.not_full.notify(len(entries))
+            return [entry[1] for entry in entries]
+
+    def put(self, item, timeout=None):
+        """
+        Add an item, waiting up to timeout seconds for room. Returns False on timeout.
+        """
+        with self.not_full:
+            if not self.not_full.wait_for(lambda: self.growable or not self.is_full(), timeout):
+                return False
+            super().enqueue((time.perf_counter(), item))
+            self.not_empty.notify()
+            return True
+
+    def take(self, timeout=None):
+        """
+        Remove the front item, waiting up to timeout seconds for one.
+        Returns (item, seconds it waited in the queue), or None on timeout.
+        """
+        with self.not_empty:
+            if not self.not_empty.wait_for(lambda: self.count, timeout):
+                return None
+            enqueued_at, item = super().dequeue()
+            self.not_full.notify()
+            return item, time.perf_counter() - enqueued_at
+
+
+class PriorityOrderQueue:
+    """
+    Orders served by priority, lowest number first and first come, first
+    served within a priority. A heap of [key, arrival, push, item] entries
+    makes enqueue and dequeue O(log n). The methods match CircularQueue, so
+    the app can use either.
+
+    With aging > 0 the key is the priority plus aging times the arrival
+    number, so every later arrival counts against it: an order of priority
+    p is served before any order of priority q < p arriving more than
+    (p - q) / aging orders after it. Low priorities wait longer, but not
+    forever, and since a key never changes once pushed aging costs nothing
+    when dequeuing.
+
+    reprioritize(item) re-keys a queued item after its priority changed.
+    The old entry is marked removed and skipped when it reaches the top of
+    the heap (lazy deletion); the new one keeps the item's arrival number.
+    Items are told apart by identity, so queue distinct objects such as
+    Order records, not repeated strings.
+    """
+    REMOVED = object()  # Stands in for the item of a stale heap entry
+
+    def __init__(self, capacity, growable=False, aging=0.0, priority_of=attrgetter("priority")):
+        self.capacity = capacity
+        self.growable = growable
+        self.aging = aging
+        self.priority_of = priority_of
+        self.heap = []
+        self.entries = {}  # id(item) -> its live heap entry
+        self.arrivals = 0
+        self.pushes = 0  # Breaks ties between the old and new entry of a re-keyed item
+        self._ordered = None  # Items in service order, rebuilt after a change
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.ordered())
+
+    def get(self, index):
+        """
+        Return the item at position index in service order.
+        """
+        return self.ordered()[index]
+
+    def is_full(self):
+        return len(self.entries) == self.capacity
+
+    def is_empty(self):
+        return not self.entries
+
+    @timed("priority queue enqueue")
+    def enqueue(self, item):
+        if self.is_full():
+            if not self.growable:
+                return False  # Queue is full
+            self.capacity *= 2
+        self._push(item, self.arrivals)
+        self.arrivals += 1
+        return True
+
+    @timed("priority queue dequeue")
+    def dequeue(self):
+        while self.heap:
+            item = heapq.heappop(self.heap)[3]
+            if item is not self.REMOVED:
+                del self.entries[id(item)]
+                self._ordered = None
+                return item
+        return None  # Queue is empty
+
+    @timed("priority queue reprioritize")
+    def reprioritize(self, item):
+        """
+        Move a queued item to the place its current priority gives it.
+        Returns False if the item is not in the queue.
+        """
+        entry = self.entries.get(id(item))
+        if entry is None:
+            return False
+        entry[3] = self.REMOVED
+        self._push(item, entry[1])
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            # Mostly stale entries: rebuild so the heap does not keep growing
+            self.heap = [entry for entry in self.heap if entry[3] is not self.REMOVED]
+            heapq.heapify(self.heap)
+        return True
+
+    def ordered(self):
+        if self._ordered is None:
+            self._ordered = [entry[3] for entry in sorted(self.entries.values())]
+        return self._ordered
+
+    def display(self):
+        return list(self.ordered())
+
+    def _push(self, item, arrival):
+        entry = [self.priority_of(item) + self.aging * arrival, arrival, self.pushes, item]
+        self.pushes += 1
+        self.entries[id(item)] = entry
+        heapq.heappush(self.heap, entry)
+        self._ordered = None
+
+
+class OrderWorkerPool:
+    """
+    Worker threads that drain a BlockingCircularQueue concurrently.
+    handler(order) runs on a worker thread and its return values are put in
+    `results`; Tk widgets may only be touched from the mainloop thread, so
+    the app polls `results` with after() instead of the workers calling Tk.
+    An order whose handler raises is logged and counted in `failed`; the
+    worker goes on with the next one.
+    """
+    def __init__(self, orders, handler, workers=4):
+        self.orders = orders
+        self.handler = handler
+        self.results = queue.SimpleQueue()
+        self.stop_event = threading.Event()
+        self.threads = [threading.Thread(target=self.run, daemon=True) for _ in range(workers)]
+        self.stats_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.wait_times = deque(maxlen=100_000)  # Most recent queue waits, in seconds
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            taken = self.orders.take(timeout=0.1)
+            if taken is None:
+                continue
+            order, waited = taken
+            try:
+                self.results.put(self.handler(order))
+            except Exception:
+                log.exception("order handler failed for %s", order)
+                with self.stats_lock:
+                    self.failed += 1
+                continue
+            with self.stats_lock:
+                self.processed += 1
+                self.wait_times.append(waited)
+
+    def stats(self):
+        """
+        Orders per second since start() and queue-wait percentiles in milliseconds.
+        """
+        with self.stats_lock:
+            processed = self.processed
+            failed = self.failed
+            waits = sorted(self.wait_times)
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0
+        result = {"processed": processed, "failed": failed, "orders_per_sec": processed / elapsed if elapsed else 0.0}
+        for percentile in (50, 95, 99):
+            index = min(len(waits) - 1, len(waits) * percentile // 100)
+            result[f"wait_p{percentile}_ms"] = waits[index] * 1000 if waits else 0.0
+        return result
+
+
+def parse_price(price):
+    """
+    Price text such as "12", "12.5" or "12.50" in whole cents, or None if it
+    is not an amount with at most two decimals.
+    """
+    match = PRICE.fullmatch(price)
+    if not match:
+        return None
+    return int(match[1]) * 100 + int((match[2] or "0").ljust(2, "0"))
+
+
+def format_cents(cents):
+    return f"${cents // 100:,}.{cents % 100:02d}"
+
+
+def validate_order(order, price):
+    """
+    Return an error message if the order cannot be queued, otherwise None.
+    """
+    if not order or not price:
+        return "Please enter both an order and a price!"
+    if parse_price(price) is None:
+        return "Price must be a valid number!"
+    return None
+
+
+class Order:
+    """
+    One queued order. The price is kept in integer cents, so totals add up
+    exactly; str() gives the text the queue used to store.
+    """
+    __slots__ = ("number", "item", "cents", "priority")
+
+    def __init__(self, number, item, cents, priority=None):
+        self.number = number
+        self.item = item
+        self.cents = cents
+        self.priority = priority  # Lower is served first, for PriorityOrderQueue
+
+    def __str__(self):
+        dollars, cents = divmod(self.cents, 100)
+        price = f"{dollars}.{cents:02d}" if cents else str(dollars)
+        text = f"Order #{self.number}: {self.item} (Price: ${price})"
+        return text if self.priority is None else f"{text} [Priority {self.priority}]"
+
+    def __repr__(self):
+        return f"Order({self.number!r}, {self.item!r}, {self.cents!r}, {self.priority!r})"
+
+
+class OrderStats:
+    """
+    Running totals of the orders going through a queue: what is waiting and
+    what it is worth, revenue from processed orders, and orders per item.
+    Call enqueued() and processed() as orders come and go; each is O(1),
+    so nothing is recounted from the queue. Safe to call from any thread.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.queue_value = 0  # Cents
+        self.processed_count = 0
+        self.revenue = 0  # Cents
+        self.queued_items = Counter()
+        self.processed_items = Counter()
+
+    def enqueued(self, order):
+        with self.lock:
+            self.queued += 1
+            self.queue_value += order.cents
+            self.queued_items[order.item] += 1
+
+    def withdrawn(self, order):
+        """
+        Take back enqueued() for an order the queue turned away.
+        """
+        with self.lock:
+            self._dequeued(order)
+
+    def processed(self, order):
+        with self.lock:
+            self._dequeued(order)
+            self.processed_count += 1
+            self.revenue += order.cents
+            self.processed_items[order.item] += 1
+
+    def _dequeued(self, order):
+        self.queued -= 1
+        self.queue_value -= order.cents
+        count = self.queued_items[order.item] - 1
+        if count:
+            self.queued_items[order.item] = count
+        else:
+            del self.queued_items[order.item]
+
+    def top_items(self, n=3):
+        """
+        The n most processed items as (item, orders) pairs.
+        """
+        with self.lock:
+            return heapq.nlargest(n, self.processed_items.items(), key=lambda pair: pair[1])
+
+    def text(self):
+        with self.lock:
+            return (f"Queued: {self.queued} orders worth {format_cents(self.queue_value)}  |  "
+                    f"Processed: {self.processed_count} orders, revenue {format_cents(self.revenue)}")
+
+
+class OrderIntake:
+    """
+    Numbers orders and puts them in the queue. The Tk entries and the order
+    server (order_server.py) both submit through here, so the numbering is
+    shared; with a BlockingCircularQueue it is safe to call from any thread.
+    Accepted orders are counted in `stats`, if given, before they are queued,
+    so a worker that takes one at once never sees it uncounted.
+    """
+    def __init__(self, orders, stats=None, max_names=MAX_SHARED_NAMES):
+        self.orders = orders
+        self.stats = stats
+        self.order_count = 0  # Counter to number the orders
+        # Recent item names, so orders for the same item share one string;
+        # least recently ordered first, at most max_names of them
+        self.names = OrderedDict()
+        self.max_names = max_names
+        self.lock = threading.Lock()
+
+    def submit(self, order, price, priority=None):
+        """
+        Queue a validated order and return it as an Order, or None if the queue is full.
+        """
+        with self.lock:
+            order = self.share_name(order)
+            numbered_order = Order(self.order_count + 1, order, parse_price(price), priority)
+            if self.stats:
+                self.stats.enqueued(numbered_order)
+            if not self.orders.enqueue(numbered_order):
+                if self.stats:
+                    self.stats.withdrawn(numbered_order)
+                return None
+            self.order_count += 1  # Only count orders that made it into the queue
+            return numbered_order
+
+    def share_name(self, name):
+        names = self.names
+        shared = names.get(name)
+        if shared is not None:
+            names.move_to_end(name)
+            return shared
+        names[name] = name
+        if len(names) > self.max_names:
+            names.popitem(last=False)
+        return name
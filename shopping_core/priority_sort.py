@@ -0,0 +1,262 @@
+"""
+Priority sorting for the product list in topic7.py.
+
+sort_by_priority() uses list.sort, which is a stable merge sort that
+finds the runs already in order, written in C. The hand-written
+strategies in SORT_STRATEGIES are kept to compare against (see
+bench_priority_sort). None of them beat list.sort on any list shape or
+size measured, from 10 to 300k products: at 300k products the natural
+merge sort is 25-55x slower and counting sort 2-13x slower. Every
+strategy is stable, so products with the same priority keep the order in
+which they were added.
+
+top_k(), page() and priority_band() answer "the first few products in
+priority order" without sorting the whole list: a plain list goes through
+heapq.nsmallest, O(n log k), and a SortedProductList is already in order
+and is sliced directly.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from operator import itemgetter
+
+from shopping_core.instrument import timed
+
+priority_of = itemgetter('priority')
+
+
+# Insertion Sort Function
+@timed("insertion_sort")
+def insertion_sort(data):
+    for i in range(1, len(data)):
+        current_item = data[i]
+        j = i - 1
+        while j >= 0 and data[j]['priority'] > current_item['priority']:
+            data[j + 1] = data[j]
+            j -= 1
+        data[j + 1] = current_item
+    return data
+
+
+def counting_sort(data):
+    """
+    Sort whole-number priorities by dropping each product into a bucket.
+    Buckets are filled in list order, which keeps the sort stable.
+    """
+    if not data:
+        return data
+    priorities = [product['priority'] for product in data]
+    low = min(priorities)
+    buckets = [[] for _ in range(max(priorities) - low + 1)]
+    for product, priority in zip(data, priorities):
+        buckets[priority - low].append(product)
+    data[:] = [product for bucket in buckets for product in bucket]
+    return data
+
+
+def find_runs(data):
+    """
+    Split the list into runs that are already sorted.
+    Strictly descending runs are reversed in place so that every run is
+    ascending; equal priorities never form a descending run, which keeps
+    the order of ties.
+    """
+    runs = []
+    n = len(data)
+    start = 0
+    while start < n:
+        end = start + 1
+        if end < n and data[end]['priority'] < data[start]['priority']:
+            while end < n and data[end]['priority'] < data[end - 1]['priority']:
+                end += 1
+            data[start:end] = data[start:end][::-1]
+        else:
+            while end < n and data[end]['priority'] >= data[end - 1]['priority']:
+                end += 1
+        runs.append((start, end))
+        start = end
+    return runs
+
+
+def merge(left, right):
+    """
+    Merge two sorted lists, taking from the left list first on ties.
+    """
+    result = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if right[j]['priority'] < left[i]['priority']:
+            result.append(right[j])
+            j += 1
+        else:
+            result.append(left[i])
+            i += 1
+    result.extend(left[i:])
+    result.extend(right[j:])
+    return result
+
+
+def merge_sort(data):
+    """
+    Natural merge sort: detect the sorted runs, then merge neighbouring
+    runs until one is left. A list that is already sorted costs one pass.
+    """
+    runs = [data[start:end] for start, end in find_runs(data)]
+    while len(runs) > 1:
+        merged = [merge(runs[k], runs[k + 1]) for k in range(0, len(runs) - 1, 2)]
+        if len(runs) % 2:
+            merged.append(runs[-1])
+        runs = merged
+    if runs:
+        data[:] = runs[0]
+    return data
+
+
+def builtin_sort(data):
+    data.sort(key=priority_of)
+    return data
+
+
+SORT_STRATEGIES = {
+    "builtin": builtin_sort,
+    "insertion": insertion_sort,
+    "counting": counting_sort,
+    "merge": merge_sort,
+}
+
+
+@timed("sort_by_priority")
+def sort_by_priority(data, strategy="builtin"):
+    """
+    Sort the products in place by priority and return the list.
+    Pass another name from SORT_STRATEGIES to compare a strategy.
+    """
+    return SORT_STRATEGIES[strategy](data)
+
+
+class SortedProductList:
+    """
+    Products kept in priority order as they are added.
+    Products live in blocks of at most BLOCK_SIZE, so an insert bisects to
+    the right block and only shifts that block. A new product goes after the
+    ones already there with the same priority, as the stable sort would put it.
+    """
+    BLOCK_SIZE = 1000
+
+    def __init__(self, products=()):
+        self._blocks = []
+        self._maxes = []  # Highest priority in each block
+        self._len = 0
+        self.add_many(products)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from block
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("product index out of range")
+        for block in self._blocks:
+            if index < len(block):
+                return block[index]
+            index -= len(block)
+
+    def slice(self, start, stop):
+        """
+        Products start to stop - 1 in priority order, skipping whole blocks.
+        """
+        found = []
+        for block in self._blocks:
+            if stop <= 0:
+                break
+            if start < len(block):
+                found.extend(block[max(start, 0):stop])
+            start -= len(block)
+            stop -= len(block)
+        return found
+
+    def band(self, low, high):
+        """
+        Yield the products with low <= priority <= high, in priority order.
+        """
+        k = bisect_left(self._maxes, low)  # First block that can hold low
+        for block in self._blocks[k:]:
+            for product in block[bisect_left(block, low, key=priority_of):]:
+                if product['priority'] > high:
+                    return
+                yield product
+
+    @timed("sorted products add")
+    def add(self, product):
+        """
+        Insert one product in priority order.
+        """
+        priority = product['priority']
+        if not self._blocks:
+            self._blocks.append([product])
+            self._maxes.append(priority)
+            self._len = 1
+            return
+        k = min(bisect_right(self._maxes, priority), len(self._blocks) - 1)
+        block = self._blocks[k]
+        block.insert(bisect_right(block, priority, key=priority_of), product)
+        self._maxes[k] = block[-1]['priority']
+        if len(block) > self.BLOCK_SIZE:
+            half = len(block) // 2
+            self._blocks[k:k + 1] = [block[:half], block[half:]]
+            self._maxes[k:k + 1] = [block[half - 1]['priority'], block[-1]['priority']]
+        self._len += 1
+
+    def add_many(self, products):
+        """
+        Sort a batch of products and merge it into the existing order in a
+        single pass instead of inserting them one by one.
+        """
+        batch = sort_by_priority(list(products))
+        if not batch:
+            return
+        merged = list(heapq.merge(self, batch, key=priority_of))
+        half = self.BLOCK_SIZE // 2
+        self._blocks = [merged[i:i + half] for i in range(0, len(merged), half)]
+        self._maxes = [block[-1]['priority'] for block in self._blocks]
+        self._len = len(merged)
+
+
+@timed("top_k")
+def top_k(products, k):
+    """
+    The k products that come first in priority order, in that order. Ties
+    keep the order in which the products were added, like the sort does.
+    """
+    if isinstance(products, SortedProductList):
+        return products.slice(0, k)
+    return heapq.nsmallest(k, products, key=priority_of)
+
+
+@timed("page")
+def page(products, offset, limit):
+    """
+    Products offset to offset + limit - 1 of the sorted order. O(n log(offset + limit))
+    for a plain list, so meant for the first pages rather than paging through everything.
+    """
+    if isinstance(products, SortedProductList):
+        return products.slice(offset, offset + limit)
+    return heapq.nsmallest(offset + limit, products, key=priority_of)[offset:]
+
+
+@timed("priority_band")
+def priority_band(products, low, high, limit=None):
+    """
+    Products with low <= priority <= high in priority order, at most limit of them.
+    """
+    if isinstance(products, SortedProductList):
+        return list(islice(products.band(low, high), limit))
+    matches = [product for product in products if low <= product['priority'] <= high]
+    if limit is None:
+        return sort_by_priority(matches)
+    return heapq.nsmallest(limit, matches, key=priority_of)
@@ -0,0 +1,177 @@
+"""
+Replay a file of shopping operations against the engines at full speed.
+
+One operation per line; blank lines and lines starting with # are skipped.
+The first word picks the engine, the rest are its arguments:
+
+    basket add Milk          basket remove Milk       (topic2 cart with quantities)
+    orders add Rice 1200     orders process           (topic3 order queue)
+    cart add Milk            cart remove Milk         (topic4 undo/redo cart)
+    cart undo                cart redo
+    stack add Milk           stack process            (topic5/topic6 LIFO cart)
+    products add Rice 3      products sort            (topic7 priority list)
+
+Item names may contain spaces; for "orders add" and "products add" the
+last word is the price or priority.
+
+    python -m shopping_core ops.txt
+"""
+import argparse
+import sys
+import time
+
+from shopping_core.cart import DoublyLinkedList, LifoCart
+from shopping_core.history import UndoRedoCart
+from shopping_core.orders import CircularQueue, OrderIntake, OrderStats, validate_order
+from shopping_core.priority_sort import sort_by_priority
+
+
+class ReplaySession:
+    """
+    One instance of every engine, driven by text operations.
+    """
+    def __init__(self):
+        self.basket = DoublyLinkedList()
+        self.orders = CircularQueue(1_000, growable=True)
+        self.order_stats = OrderStats()
+        self.intake = OrderIntake(self.orders, self.order_stats)
+        self.cart = UndoRedoCart()
+        self.stack = LifoCart()
+        self.products = []
+        self.errors = 0
+        # (engine, action) -> handler; only these can be reached from a line
+        self.handlers = {
+            ("basket", "add"): self.basket_add,
+            ("basket", "remove"): self.basket_remove,
+            ("orders", "add"): self.orders_add,
+            ("orders", "process"): self.orders_process,
+            ("cart", "add"): self.cart_add,
+            ("cart", "remove"): self.cart_remove,
+            ("cart", "undo"): self.cart_undo,
+            ("cart", "redo"): self.cart_redo,
+            ("stack", "add"): self.stack_add,
+            ("stack", "process"): self.stack_process,
+            ("products", "add"): self.products_add,
+            ("products", "sort"): self.products_sort,
+        }
+
+    def apply(self, line):
+        """
+        Apply one operation line. Returns False, changing nothing, if it
+        could not be applied: an unknown operation, missing or extra
+        arguments, or one the engine refuses.
+        """
+        words = line.split()
+        engine, action, args = words[0], words[1] if len(words) > 1 else "", words[2:]
+        handler = self.handlers.get((engine, action))
+        if handler is None or not handler(args):
+            self.errors += 1
+            return False
+        return True
+
+    # Handlers take the words after the action and check them before
+    # touching an engine
+
+    def basket_add(self, args):
+        if not args:
+            return False
+        self.basket.add(" ".join(args))
+        return True
+
+    def basket_remove(self, args):
+        item = " ".join(args)
+        if item not in self.basket:
+            return False
+        self.basket.remove(item)
+        return True
+
+    def orders_add(self, args):
+        if len(args) < 2:
+            return False
+        order, price = " ".join(args[:-1]), args[-1]
+        if validate_order(order, price):
+            return False
+        return self.intake.submit(order, price) is not None
+
+    def orders_process(self, args):
+        if args:
+            return False
+        order = self.orders.dequeue()
+        if order is None:
+            return False
+        self.order_stats.processed(order)
+        return True
+
+    def cart_add(self, args):
+        if not args:
+            return False
+        self.cart.add(" ".join(args))
+        return True
+
+    def cart_remove(self, args):
+        return bool(args) and self.cart.remove(" ".join(args))
+
+    def cart_undo(self, args):
+        return not args and self.cart.undo() is not None
+
+    def cart_redo(self, args):
+        return not args and self.cart.redo() is not None
+
+    def stack_add(self, args):
+        if not args:
+            return False
+        self.stack.add(" ".join(args))
+        return True
+
+    def stack_process(self, args):
+        return not args and self.stack.process() is not None
+
+    def products_add(self, args):
+        if len(args) < 2 or not args[-1].isdigit():
+            return False
+        self.products.append({"product": " ".join(args[:-1]), "priority": int(args[-1])})
+        return True
+
+    def products_sort(self, args):
+        if args:
+            return False
+        sort_by_priority(self.products)
+        return True
+
+    def summary(self):
+        return (f"basket: {len(self.basket)} distinct items\n"
+                f"orders: {len(self.orders)} queued, {self.intake.order_count} numbered; "
+                f"{self.order_stats.text()}\n"
+                f"cart: {len(self.cart)} items, at version {self.cart.version}\n"
+                f"stack: {len(self.stack)} items, {len(self.stack.history)} history entries\n"
+                f"products: {len(self.products)}")
+
+
+def replay(lines, session=None):
+    """
+    Apply every operation in lines and return (session, operations applied, seconds).
+    """
+    session = session or ReplaySession()
+    count = 0
+    start = time.perf_counter()
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            session.apply(line)
+            count += 1
+    return session, count, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m shopping_core",
+                                     description="Replay a file of shopping operations.")
+    parser.add_argument("path", help="operations file, or - for standard input")
+    args = parser.parse_args(argv)
+    if args.path == "-":
+        session, count, seconds = replay(sys.stdin)
+    else:
+        with open(args.path, encoding="utf-8") as lines:
+            session, count, seconds = replay(lines)
+    print(session.summary())
+    print(f"{count} operations ({session.errors} rejected) in {seconds:.3f} s, "
+          f"{count / seconds if seconds else 0:.0f} ops/s")
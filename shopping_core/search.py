@@ -0,0 +1,112 @@
+"""
+As-you-type item search for the catalog of topic2.PY, topic5.py and topic6.py.
+
+SearchIndex works on a list of names indexed by ID, such as Catalog.names,
+and returns IDs. Prefix matches come from a sorted array of case-folded
+names (one bisect per keystroke); typo-tolerant matches come from a trigram
+index, scoring the names that share the rarest trigrams of the query.
+
+Building the index for a large catalog takes seconds, so the apps use
+BackgroundSearchIndex, which builds it on a thread while the window opens.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+MAX_POSTINGS = 20_000  # Trigram entries scanned per fuzzy query, at most
+
+
+def trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, names):
+        self.names = names
+        ids = [i for i, name in enumerate(names) if name]
+        ids.sort(key=lambda i: names[i].casefold())
+        self.sorted_ids = ids
+        self.sorted_keys = [names[i].casefold() for i in ids]
+        postings = {}
+        for i in ids:
+            for gram in trigrams(names[i].casefold()):
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: array("i", found) for gram, found in postings.items()}
+
+    def prefix(self, text, limit=10):
+        """
+        IDs of up to limit names starting with text, ignoring case, in name order.
+        """
+        key = text.casefold()
+        start = bisect_left(self.sorted_keys, key)
+        found = []
+        for position in range(start, min(start + limit, len(self.sorted_keys))):
+            if not self.sorted_keys[position].startswith(key):
+                break
+            found.append(self.sorted_ids[position])
+        return found
+
+    def fuzzy(self, text, limit=10):
+        """
+        IDs of up to limit names most similar to text, best first.
+        Only the rarest trigrams of the query are looked up, until
+        MAX_POSTINGS entries have been scanned, so a common trigram shared by
+        most of the catalog does not slow down every keystroke.
+        """
+        grams = trigrams(text.casefold())
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        shared = Counter()
+        scanned = 0
+        for found in lists:
+            if scanned + len(found) > MAX_POSTINGS and scanned:
+                break
+            shared.update(found)
+            scanned += len(found)
+        least = 2 if len(grams) > 2 else 1
+
+        def similarity(i):
+            # Shared trigrams over all trigrams of both (Jaccard); a name of
+            # n characters has n trigrams
+            return shared[i] / (len(grams) + len(self.names[i]) - shared[i])
+
+        # Rank only the names sharing the most trigrams; most_common runs in C
+        candidates = [i for i, count in shared.most_common(limit * 20) if count >= least]
+        candidates.sort(key=similarity, reverse=True)
+        return candidates[:limit]
+
+    def suggest(self, text, limit=10):
+        """
+        Prefix matches first, then fuzzy matches to fill up to limit.
+        """
+        text = text.strip()
+        if not text:
+            return []
+        found = self.prefix(text, limit)
+        if len(found) < limit and len(text) >= 3:
+            seen = set(found)
+            found += [i for i in self.fuzzy(text, limit) if i not in seen][:limit - len(found)]
+        return found
+
+
+class BackgroundSearchIndex:
+    """
+    A SearchIndex built on a daemon thread. suggest() finds nothing until
+    the index is ready, instead of holding up the caller.
+    """
+    def __init__(self, names):
+        self.index = None
+        self.thread = threading.Thread(target=self.build, args=(names,), daemon=True)
+        self.thread.start()
+
+    def build(self, names):
+        self.index = SearchIndex(names)
+
+    @property
+    def ready(self):
+        return self.index is not None
+
+    def suggest(self, text, limit=10):
+        index = self.index
+        return index.suggest(text, limit) if index is not None else []
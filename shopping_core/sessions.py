@@ -0,0 +1,170 @@
+"""
+Carts of many shoppers at once, one LifoCart per session, for topic5.py.
+
+SessionCartStore keeps the recently used carts in memory and writes the
+least recently used ones to `<directory>/<session>.cart` once the carts in
+memory go over `memory_budget` bytes. get() loads an evicted cart back by
+replaying its file, so callers never see the difference.
+
+A cart file holds cart actions as journal records (see journal.py): ADD
+with the item name, PROCESS without one, about 3 bytes plus the name per
+action against 60-odd in memory. Evicting a cart appends the actions
+since it was last written, unless that would leave the file with more
+than COMPACT_FACTOR records per item in the cart (plus COMPACT_SLACK);
+then the file is rewritten as a snapshot, one ADD per item. A reload
+therefore costs O(items in the cart), however long the session has been
+going. A reloaded cart's history is the actions in its file, so it may
+start with a snapshot's adds.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from shopping_core.cart import LifoCart
+from shopping_core.instrument import DATA, OperationStats, timed
+from shopping_core.journal import ADD, PROCESS, encode, iter_records
+
+# Rough bytes of a LifoCart, measured with tracemalloc; item names are not
+# counted, since carts share them
+CART_BYTES = 1200
+HISTORY_ENTRY_BYTES = 64  # Tuple and list slot
+ITEM_BYTES = 96  # Stack node and its depth
+DISTINCT_ITEM_BYTES = 64  # CartSummary count and bucket entries
+
+COMPACT_FACTOR = 2  # Records per item a cart file may hold before it is rewritten
+COMPACT_SLACK = 32  # Records allowed on top, so small carts are not rewritten on every eviction
+
+
+def cart_bytes(cart):
+    return (CART_BYTES + HISTORY_ENTRY_BYTES * len(cart.history)
+            + ITEM_BYTES * len(cart) + DISTINCT_ITEM_BYTES * len(cart.summary))
+
+
+class SessionCartStore:
+    """
+    LifoCarts by session name, least recently used first in `carts`.
+
+    Sizes are estimated with cart_bytes() when a cart is fetched, so
+    changes made to it count from its next get(). The cart fetched last is
+    never evicted, so get() the cart again for each action rather than
+    holding on to it while other sessions come and go.
+    """
+    def __init__(self, directory, memory_budget=64 * 1024 * 1024):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.carts = OrderedDict()  # session -> LifoCart
+        self.sizes = {}  # session -> estimated bytes
+        self.saved = {}  # session -> cart.action_count when its file was written, None if it has no file
+        self.file_records = {}  # session -> records in its file
+        self.resident = 0  # Estimated bytes of the carts in memory
+        self.names = {}  # One string per item name across reloaded carts
+        self.hits = 0
+        self.reloads = 0
+        self.created = 0
+        self.evictions = 0
+        self.reload_times = OperationStats(DATA)
+
+    def __len__(self):
+        return len(self.carts)
+
+    def path(self, session):
+        digest = hashlib.sha1(session.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.cart")
+
+    @timed("session get")
+    def get(self, session):
+        """
+        The cart of session, loaded from disk or created if it is not in memory.
+        """
+        with self.lock:
+            cart = self.carts.get(session)
+            if cart is not None:
+                self.hits += 1
+                self.carts.move_to_end(session)
+                self.resident -= self.sizes[session]
+            else:
+                cart = self.carts[session] = self._load(session)
+            self.sizes[session] = cart_bytes(cart)
+            self.resident += self.sizes[session]
+            while self.resident > self.memory_budget and len(self.carts) > 1:
+                self._evict(next(iter(self.carts)))
+            return cart
+
+    def _load(self, session):
+        start = time.perf_counter_ns()
+        cart = LifoCart()
+        path = self.path(session)
+        if not os.path.exists(path):
+            self.created += 1
+            self.saved[session] = None
+            self.file_records[session] = 0
+            return cart
+        names = self.names
+        for op, item, _ in iter_records(path):
+            if op == ADD:
+                cart.add(names.setdefault(item, item))
+            elif op == PROCESS:
+                cart.process()
+        self.reload_times.add(time.perf_counter_ns() - start)
+        self.reloads += 1
+        self.saved[session] = self.file_records[session] = cart.action_count
+        return cart
+
+    def _save(self, session, cart):
+        """
+        Append the actions since the last save to the file of session, or
+        rewrite it as a snapshot once appending would make it too long or
+        some of those actions were trimmed from the cart's history.
+        """
+        saved = self.saved.get(session)
+        if saved == cart.action_count:
+            return
+        unsaved = (saved or 0) - cart.history_start
+        new = cart.history[max(unsaved, 0):]
+        path = self.path(session)
+        if unsaved < 0 or self.file_records[session] + len(new) > COMPACT_FACTOR * len(cart) + COMPACT_SLACK:
+            temporary = path + ".tmp"
+            with open(temporary, "wb") as out:
+                out.write(b"".join(encode(ADD, item) for item in cart))
+            os.replace(temporary, path)  # A crash leaves the old file or the new one
+            self.file_records[session] = len(cart)
+        else:
+            with open(path, "ab") as out:
+                out.write(b"".join(encode(ADD, item) if action == "Add" else encode(PROCESS)
+                                   for action, item in new))
+            self.file_records[session] += len(new)
+        self.saved[session] = cart.action_count
+
+    def _evict(self, session):
+        self._save(session, self.carts.pop(session))
+        self.resident -= self.sizes.pop(session)
+        del self.saved[session]
+        del self.file_records[session]
+        self.evictions += 1
+
+    def flush(self):
+        """
+        Write the new actions of every cart in memory to disk, keeping them loaded.
+        """
+        with self.lock:
+            for session, cart in self.carts.items():
+                self._save(session, cart)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.reloads + self.created
+            return {
+                "sessions_in_memory": len(self.carts),
+                "resident_bytes": self.resident,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "hits": self.hits,
+                "reloads": self.reloads,
+                "created": self.created,
+                "evictions": self.evictions,
+                "reload_mean_us": self.reload_times.summary()["mean_us"],
+                "reload_p99_us": self.reload_times.percentile(99),
+            }
@@ -0,0 +1,83 @@
+"""
+Running totals of a cart, for the cart line of topic2.PY, topic5.py and topic6.py.
+"""
+from bisect import bisect_left, insort
+
+
+class CartSummary:
+    """
+    Distinct items, total quantity and the items with the highest quantity,
+    kept up to date in O(1) per add or remove instead of being recounted
+    from the cart.
+
+    Items are grouped in buckets by quantity, so the top items are read from
+    the highest buckets without sorting. `levels` lists the quantities that
+    have a bucket; it stays short, since n distinct quantities need at least
+    n * (n + 1) / 2 items in the cart.
+    """
+    def __init__(self):
+        self.counts = {}  # item -> quantity
+        self.buckets = {}  # quantity -> {item: None}, in the order the items reached it
+        self.levels = []  # Quantities that have a bucket, ascending
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, item):
+        count = self.counts.get(item, 0)
+        if count:
+            self._leave(item, count)
+        self.counts[item] = count + 1
+        self._enter(item, count + 1)
+        self.total += 1
+
+    def remove(self, item):
+        """
+        Take one of item out of the totals; item must be in them.
+        """
+        count = self.counts[item]
+        self._leave(item, count)
+        if count == 1:
+            del self.counts[item]
+        else:
+            self.counts[item] = count - 1
+            self._enter(item, count - 1)
+        self.total -= 1
+
+    def top(self, n):
+        """
+        Up to n (item, quantity) pairs, highest quantity first.
+        """
+        found = []
+        for count in reversed(self.levels):
+            for item in self.buckets[count]:
+                if len(found) == n:
+                    return found
+                found.append((item, count))
+        return found
+
+    def text(self, limit=3):
+        """
+        One line for the cart label, built from at most limit items.
+        """
+        if not self.total:
+            return "Cart: Empty"
+        top = ", ".join(f"{item} x{count}" for item, count in self.top(limit))
+        more = len(self.counts) - limit
+        return (f"Cart: {self.total} items, {len(self.counts)} distinct. Most: {top}"
+                + (f" and {more} more" if more > 0 else ""))
+
+    def _enter(self, item, count):
+        bucket = self.buckets.get(count)
+        if bucket is None:
+            bucket = self.buckets[count] = {}
+            insort(self.levels, count)
+        bucket[item] = None
+
+    def _leave(self, item, count):
+        bucket = self.buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[count]
+            del self.levels[bisect_left(self.levels, count)]
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+
+from shopping_core.archive import HistoryArchive
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, "history archive queries need NumPy")
+class TopItemsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive = HistoryArchive(os.path.join(directory.name, "history"))
+        self.addCleanup(self.archive.close)
+        self.archive.extend([("Add", "Milk"), ("Add", "Milk"), ("Add", "Bread"),
+                             ("Add", "Eggs"), ("Add", "Milk"), ("Add", "Bread"), ("Process", "Tea")])
+
+    def test_no_items_for_zero_or_negative_n(self):
+        self.assertEqual(self.archive.top_items(0), [])
+        self.assertEqual(self.archive.top_items(-2), [])
+
+    def test_n_is_capped_at_the_number_of_items(self):
+        expected = [("Milk", 3), ("Bread", 2), ("Eggs", 1)]
+        self.assertEqual(self.archive.top_items(3), expected)
+        self.assertEqual(self.archive.top_items(100), expected)
+        self.assertEqual(self.archive.top_items(2), expected[:2])
+
+
+if __name__ == "__main__":
+    unittest.main()
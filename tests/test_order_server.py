@@ -0,0 +1,67 @@
+import asyncio
+import json
+import socket
+import unittest
+
+from order_server import OrderServer
+from shopping_core.orders import BlockingCircularQueue, OrderIntake
+
+
+def make_server(port=0):
+    return OrderServer(OrderIntake(BlockingCircularQueue(100, growable=True)), port=port)
+
+
+class OrderServerStartTest(unittest.TestCase):
+    def test_port_in_use_raises_instead_of_hanging(self):
+        with socket.socket() as taken:
+            taken.bind(("127.0.0.1", 0))
+            taken.listen()
+            server = make_server(taken.getsockname()[1])
+            with self.assertRaises(OSError):
+                server.start_in_thread()
+            self.assertTrue(server.ready.is_set())
+            server.stop()  # Nothing to stop; must not fail
+
+
+class HandleRequestTest(unittest.TestCase):
+    def setUp(self):
+        self.server = make_server()
+
+    def test_accepts_strings(self):
+        reply = self.server.handle_request(b'{"order": " Rice ", "price": "12.50"}')
+        self.assertEqual(reply, {"ok": True, "order": "Order #1: Rice (Price: $12.50)"})
+
+    def test_rejects_values_that_are_not_strings(self):
+        for request in ({"order": None, "price": "1"}, {"order": "Rice", "price": 12},
+                        {"order": ["Rice"], "price": "1"}, {"order": 7, "price": "1"},
+                        {"order": "Rice", "price": None}):
+            reply = self.server.handle_request(json.dumps(request).encode())
+            self.assertFalse(reply["ok"], request)
+        self.assertEqual(len(self.server.intake.orders), 0)
+
+    def test_rejects_lines_that_are_not_objects(self):
+        for line in (b"[1, 2]", b'"Rice"', b"12", b"null", b"{", b"[" * 20000, b"{\"a\":" * 20000):
+            self.assertEqual(self.server.handle_request(line),
+                             {"ok": False, "error": "Each line must be a JSON object."}, line[:10])
+
+    def test_deeply_nested_line_gets_a_reply(self):
+        self.server.start_in_thread()
+
+        async def send(line):
+            reader, writer = await asyncio.open_connection(self.server.host, self.server.port)
+            writer.write(line + b"\n")
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            writer.close()
+            await writer.wait_closed()
+            return reply
+
+        try:
+            self.assertFalse(asyncio.run(send(b"[" * 20000))["ok"])
+            self.assertTrue(asyncio.run(send(b'{"order": "Rice", "price": "1"}'))["ok"])
+        finally:
+            self.server.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import random
+import unittest
+
+from shopping_core.priority_sort import SORT_STRATEGIES, SortedProductList, sort_by_priority
+
+
+def products(priorities):
+    return [{"product": f"Item {i}", "priority": p} for i, p in enumerate(priorities)]
+
+
+class SortByPriorityTest(unittest.TestCase):
+    def test_every_strategy_is_a_stable_sort(self):
+        rng = random.Random(0)
+        for n in (0, 1, 5, 40, 500):
+            data = products([rng.randint(1, 10) for _ in range(n)])
+            expected = sorted(data, key=lambda product: product["priority"])
+            for name in SORT_STRATEGIES:
+                self.assertEqual(sort_by_priority(list(data), name), expected, (name, n))
+
+    def test_default_sorts_in_place(self):
+        data = products([3, 1, 2, 1])
+        self.assertIs(sort_by_priority(data), data)
+        self.assertEqual([product["product"] for product in data], ["Item 1", "Item 3", "Item 2", "Item 0"])
+
+    def test_sorted_product_list_matches_sort(self):
+        data = products([random.Random(1).randint(0, 50) for _ in range(3000)])
+        kept = SortedProductList(data[:1000])
+        for product in data[1000:]:
+            kept.add(product)
+        self.assertEqual(list(kept), sort_by_priority(list(data)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from shopping_core.replay import ReplaySession, replay
+
+
+class ReplaySessionTest(unittest.TestCase):
+    def test_attribute_names_are_not_operations(self):
+        session = ReplaySession()
+        for line in ["order stats", "orders stats", "order_stats x", "basket x", "apply x",
+                     "summary", "handlers get", "__init__ x", "errors"]:
+            self.assertFalse(session.apply(line), line)
+        self.assertEqual(session.errors, 9)
+
+    def test_bad_arguments_change_nothing(self):
+        session = ReplaySession()
+        for line in ["stack process now", "stack add", "cart add", "basket add", "orders add",
+                     "orders process x", "products sort x"]:
+            self.assertFalse(session.apply(line), line)
+        self.assertEqual(len(session.stack), 0)
+        self.assertEqual(len(session.stack.history), 0)
+        self.assertEqual(len(session.cart), 0)
+        self.assertEqual(len(session.basket), 0)
+
+    def test_replay_counts_rejected_lines(self):
+        session, count, _ = replay(["stack add Milk", "# comment", "", "order stats", "stack process"])
+        self.assertEqual(count, 3)
+        self.assertEqual(session.errors, 1)
+        self.assertEqual(len(session.stack), 0)
+        self.assertEqual(session.stack.history, [("Add", "Milk"), ("Process", "Milk")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,57 +1,35 @@
+import argparse
+import queue
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
-
-class CircularQueue:
-    def __init__(self, capacity):
-        self.capacity = capacity
-        self.queue = [None] * capacity
-        self.front = -1
-        self.rear = -1
-
-    def is_full(self):
-        return (self.rear + 1) % self.capacity == self.front
-
-    def is_empty(self):
-        return self.front == -1
-
-    def enqueue(self, item):
-        if self.is_full():
-            return False  # Queue is full
-        if self.is_empty():
-            self.front = 0
-        self.rear = (self.rear + 1) % self.capacity
-        self.queue[self.rear] = item
-        return True
-
-    def dequeue(self):
-        if self.is_empty():
-            return None  # Queue is empty
-        item = self.queue[self.front]
-        self.queue[self.front] = None
-        if self.front == self.rear:  # Queue becomes empty after dequeuing
-            self.front = -1
-            self.rear = -1
-        else:
-            self.front = (self.front + 1) % self.capacity
-        return item
-
-    def display(self):
-        if self.is_empty():
-            return []
-        result = []
-        index = self.front
-        while True:
-            result.append(self.queue[index])
-            if index == self.rear:
-                break
-            index = (index + 1) % self.capacity
-        return result
+from order_server import OrderServer
+from shopping_core import instrument
+from shopping_core.orders import (BlockingCircularQueue, CircularQueue, OrderIntake, OrderStats,
+                                  OrderWorkerPool, PriorityOrderQueue, validate_order)
+from widgets import StatsPanel, VirtualListbox
 
 class ShoppingAssistantApp:
-    def __init__(self, root):
-        self.queue = CircularQueue(5)
-        self.order_count = 0  # Counter to number the orders
+    def __init__(self, root, capacity=5, growable=False, workers=0, server_port=None,
+                 by_priority=False, aging=0.0):
+        self.root = root
+        self.workers = None
+        self.server = None
+        self.by_priority = by_priority
+        if by_priority:
+            if workers or server_port is not None:
+                raise ValueError("priority mode runs on the Tk thread only, without workers or the order server")
+            # Lowest priority number first; aging keeps low priorities from waiting forever
+            self.queue = PriorityOrderQueue(capacity, growable, aging)
+        elif workers or server_port is not None:
+            # Other threads touch the queue too, not only the Tk buttons
+            self.queue = BlockingCircularQueue(capacity, growable)
+        else:
+            self.queue = CircularQueue(capacity, growable)
+        if workers:
+            self.workers = OrderWorkerPool(self.queue, self.handle_order, workers)
+        self.stats = OrderStats()  # Queue value and revenue, kept up to date as orders come and go
+        self.intake = OrderIntake(self.queue, self.stats)
 
         root.title("Shopping Assistant - Circular Queue")
         root.geometry("800x600")
@@ -73,6 +51,13 @@ class ShoppingAssistantApp:
         self.price_entry = ttk.Entry(self.enqueue_frame, width=15, font=("Arial", 14))
         self.price_entry.pack(side=tk.LEFT, padx=5)
 
+        if by_priority:
+            self.priority_label = ttk.Label(self.enqueue_frame, text="Priority:", font=("Arial", 14))
+            self.priority_label.pack(side=tk.LEFT, padx=5)
+
+            self.priority_entry = ttk.Entry(self.enqueue_frame, width=5, font=("Arial", 14))
+            self.priority_entry.pack(side=tk.LEFT, padx=5)
+
         self.enqueue_button = ttk.Button(self.enqueue_frame, text="Add Order", command=self.add_order)
         self.enqueue_button.pack(side=tk.LEFT, padx=5)
 
@@ -80,58 +65,147 @@ class ShoppingAssistantApp:
         self.dequeue_button = ttk.Button(root, text="Process Order", command=self.process_order)
         self.dequeue_button.pack(pady=20)
 
+        if by_priority:
+            self.raise_button = ttk.Button(root, text="Raise Priority", command=self.raise_priority)
+            self.raise_button.pack()
+
         # Display Orders
-        self.display_label = ttk.Label(root, text="Order Queue:", font=("Arial", 16))
+        queue_title = "Order Queue (by priority):" if by_priority else "Order Queue:"
+        self.display_label = ttk.Label(root, text=queue_title, font=("Arial", 16))
         self.display_label.pack(pady=10)
 
-        self.order_list = tk.Listbox(root, width=100, height=20, font=("Arial", 14))
+        self.order_list = VirtualListbox(root, self.order_row_text, width=100, height=20, font=("Arial", 14))
         self.order_list.pack(pady=10)
 
+        # Running totals
+        self.stats_label = ttk.Label(root, text=self.stats.text(), font=("Arial", 12))
+        self.stats_label.pack(pady=5)
+
         # Status Bar
         self.status_label = ttk.Label(root, text="Welcome to the Shopping Assistant!", relief=tk.SUNKEN, anchor="w", font=("Arial", 12))
         self.status_label.pack(fill=tk.X, side=tk.BOTTOM)
 
+        if self.workers:
+            self.workers.start()
+            root.after(100, self.poll_workers)
+        if server_port is not None:
+            self.server = OrderServer(self.intake, port=server_port)
+            self.server.start_in_thread()
+            root.after(100, self.poll_server)
+
+    @instrument.timed("topic3 update_queue_display", instrument.WIDGET, redraw=instrument.app_root)
     def update_queue_display(self):
-        self.order_list.delete(0, tk.END)
-        orders = self.queue.display()
-        for i, order in enumerate(orders, start=1):  # Enumerate to add numbering
-            self.order_list.insert(tk.END, f"{i}. {order}")
+        self.order_list.set_count(len(self.queue))  # Only the visible rows are redrawn
+        self.update_stats_display()
+
+    @instrument.timed("topic3 update_stats_display", instrument.WIDGET)
+    def update_stats_display(self):
+        top = ", ".join(f"{item} x{count}" for item, count in self.stats.top_items())
+        self.stats_label.config(text=self.stats.text() + (f"  |  Top: {top}" if top else ""))
+
+    def order_row_text(self, index):
+        return f"{index + 1}. {self.queue.get(index)}"
 
+    @instrument.timed("topic3 add_order", instrument.ACTION)
     def add_order(self):
         order = self.order_entry.get().strip()
         price = self.price_entry.get().strip()
 
-        if not order or not price:
-            messagebox.showwarning("Input Error", "Please enter both an order and a price!")
-            return
-
-        if not price.isdigit():
-            messagebox.showerror("Input Error", "Price must be a valid number!")
+        error = validate_order(order, price)
+        priority = None
+        if self.by_priority:
+            priority = self.priority_entry.get().strip()
+            if not (priority.isascii() and priority.isdigit()):  # isdigit() alone takes "²" and "٣"
+                error = error or "Priority must be a whole number (0 is served first)!"
+        if error:
+            messagebox.showwarning("Input Error", error)
             return
 
         # Add numbering and price to the order
-        self.order_count += 1
-        numbered_order = f"Order #{self.order_count}: {order} (Price: ${price})"
+        numbered_order = self.intake.submit(order, price, int(priority) if priority else None)
 
-        if self.queue.enqueue(numbered_order):
+        if numbered_order:
             self.status_label.config(text=f"Order '{numbered_order}' added to the queue.")
-            self.update_queue_display()
+            if self.by_priority:
+                self.update_queue_display()  # It may land anywhere in the queue
+            else:
+                self.order_list.insert_rows(len(self.queue) - 1)
+                self.update_stats_display()
         else:
             messagebox.showerror("Queue Full", "Cannot add order. The queue is full!")
-            self.order_count -= 1  # Roll back count if enqueue fails
 
         self.order_entry.delete(0, tk.END)
         self.price_entry.delete(0, tk.END)
+        if self.by_priority:
+            self.priority_entry.delete(0, tk.END)
+
+    def raise_priority(self):
+        """
+        Move the selected order one priority level up (towards 0).
+        """
+        selection = self.order_list.curselection()
+        if not selection:
+            messagebox.showinfo("No Order Selected", "Select an order in the queue first.")
+            return
+        order = self.queue.get(selection[0])
+        if order.priority > 0:
+            order.priority -= 1
+            self.queue.reprioritize(order)
+            self.status_label.config(text=f"Order '{order}' moved up.")
+            self.update_queue_display()
+
+    def handle_order(self, order):
+        """
+        Work done for one order on a worker thread.
+        """
+        self.stats.processed(order)
+        return order
+
+    def poll_workers(self):
+        """
+        Show what the workers processed since the last poll.
+        """
+        processed = []
+        while True:
+            try:
+                processed.append(self.workers.results.get_nowait())
+            except queue.Empty:
+                break
+        if processed:
+            stats = self.workers.stats()
+            self.status_label.config(text=f"Processed order: {processed[-1]}  "
+                                          f"({stats['orders_per_sec']:.1f} orders/s, "
+                                          f"p95 wait {stats['wait_p95_ms']:.1f} ms)")
+            self.update_queue_display()
+        self.root.after(100, self.poll_workers)
 
+    def poll_server(self):
+        """
+        Redraw the queue when orders arrived through the order server.
+        """
+        if len(self.queue) != self.order_list.row_count:
+            self.update_queue_display()
+        self.root.after(100, self.poll_server)
+
+    @instrument.timed("topic3 process_order", instrument.ACTION)
     def process_order(self):
         order = self.queue.dequeue()
         if order:
+            self.stats.processed(order)
             self.status_label.config(text=f"Processed order: {order}")
-            self.update_queue_display()
+            self.order_list.delete_rows(0)
+            self.update_stats_display()
         else:
             messagebox.showinfo("Queue Empty", "No orders to process!")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shopping Assistant - Circular Queue")
+    parser.add_argument("--priority", action="store_true", help="serve orders by priority instead of first in, first out")
+    parser.add_argument("--aging", type=float, default=0.0,
+                        help="in priority mode, how much each later order counts against a waiting one")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = ShoppingAssistantApp(root)
+    app = ShoppingAssistantApp(root, by_priority=args.priority, aging=args.aging)
+    if instrument.ENABLED:
+        instrument_panel = StatsPanel(root)  # Live timings, see shopping_core/instrument.py
     root.mainloop()
@@ -1,5 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from shopping_core import instrument
+from shopping_core.history import UndoRedoCart
+from widgets import StatsPanel
 
 class ShoppingAssistant:
     def __init__(self, root):
@@ -8,9 +11,9 @@ class ShoppingAssistant:
         self.root.geometry("400x450")
         self.root.configure(bg="#f0f0f0") 
 
-        self.cart = []
-        self.undo_stack = []
-        self.redo_stack = []
+        self.cart = UndoRedoCart(listener=self)  # Calls on_append/on_remove below
+        self.cart_rows = {}  # Treeview item ID for each cart node
+        self.renumber_pending = False  # True while "No." values are out of date
 
         self.create_widgets()
 
@@ -53,10 +56,7 @@ class ShoppingAssistant:
     def add_to_cart(self):
         item = self.item_entry.get().strip()
         if item:
-            self.cart.append(item)
-            self.undo_stack.append(("add", item))
-            self.redo_stack = []  
-            self.update_cart_table()
+            self.cart.add(item)
             self.item_entry.delete(0, tk.END)
             messagebox.showinfo("Success", f"Added '{item}' to cart!")
         else:
@@ -64,53 +64,76 @@ class ShoppingAssistant:
 
     def remove_from_cart(self):
         item = self.item_entry.get().strip()
-        if item in self.cart:
-            self.cart.remove(item)
-            self.undo_stack.append(("remove", item))
-            self.redo_stack = []  
-            self.update_cart_table()
+        if self.cart.remove(item):
             self.item_entry.delete(0, tk.END)
             messagebox.showinfo("Success", f"Removed '{item}' from cart!")
         else:
             messagebox.showerror("Error", f"'{item}' not found in cart.")
 
     def undo_last_action(self):
-        if self.undo_stack:
-            action, item = self.undo_stack.pop()
-            if action == "add":
-                self.cart.remove(item)
-            elif action == "remove":
-                self.cart.append(item)
-            self.redo_stack.append((action, item))
-            self.update_cart_table()
+        undone = self.cart.undo()
+        if undone:
+            action, item = undone
             messagebox.showinfo("Undo", f"Undid {action} of '{item}'.")
         else:
             messagebox.showinfo("Undo", "No actions to undo.")
 
     def redo_last_action(self):
-        if self.redo_stack:
-            action, item = self.redo_stack.pop()
-            if action == "add":
-                self.cart.append(item)
-            elif action == "remove":
-                self.cart.remove(item)
-            self.undo_stack.append((action, item))
-            self.update_cart_table()
+        redone = self.cart.redo()
+        if redone:
+            action, item = redone
             messagebox.showinfo("Redo", f"Redid {action} of '{item}'.")
         else:
             messagebox.showinfo("Redo", "No actions to redo.")
 
+    @instrument.timed("topic4 update_cart_table", instrument.WIDGET, redraw=instrument.app_root)
     def update_cart_table(self):
         
-        for item in self.cart_table.get_children():
-            self.cart_table.delete(item)
+        if self.cart_rows:
+            self.cart_table.delete(*self.cart_rows.values())
 
         
-        for index, item in enumerate(self.cart, start=1):
-            self.cart_table.insert("", "end", values=(index, item))
+        self.cart_rows = {node: self.cart_table.insert("", "end", values=(index, node.item))
+                          for index, node in enumerate(self.cart.items.nodes(), start=1)}
+        self.renumber_pending = False
+
+    def on_reset(self):
+        """
+        The whole cart was rebuilt, e.g. after jumping to another version.
+        """
+        self.update_cart_table()
+
+    @instrument.timed("topic4 on_append", instrument.WIDGET)
+    def on_append(self, node):
+        """
+        Add one row for an item just appended to the cart.
+        """
+        self.cart_rows[node] = self.cart_table.insert("", "end", values=(len(self.cart), node.item))
+
+    @instrument.timed("topic4 on_remove", instrument.WIDGET)
+    def on_remove(self, node):
+        """
+        Delete only the row of the item removed from the cart.
+        If it was not the last row, the "No." column is fixed once the event
+        loop is idle, so several removals in a row cost a single renumbering pass.
+        """
+        self.cart_table.delete(self.cart_rows.pop(node))
+        if node.next is not None and not self.renumber_pending:
+            self.renumber_pending = True
+            self.root.after_idle(self.renumber_cart_rows)
+
+    @instrument.timed("topic4 renumber_cart_rows", instrument.WIDGET, redraw=instrument.app_root)
+    def renumber_cart_rows(self):
+        if not self.renumber_pending:
+            return
+        for index, node in enumerate(self.cart.items.nodes(), start=1):
+            self.cart_table.set(self.cart_rows[node], '#1', index)
+        self.renumber_pending = False
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = ShoppingAssistant(root)
+    if instrument.ENABLED:
+        instrument_panel = StatsPanel(root)  # Live timings, see shopping_core/instrument.py
     root.mainloop()
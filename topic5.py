@@ -1,20 +1,54 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk
-from collections import deque
+from shopping_core import instrument
+from shopping_core.cart import LifoCart
+from shopping_core.catalog import Catalog, CatalogFile
+from shopping_core.copurchase import CoPurchaseIndex
+from shopping_core.journal import ADD, PROCESS, CartJournal
+from shopping_core.search import BackgroundSearchIndex
+from shopping_core.sessions import SessionCartStore
+from widgets import ArchivedHistory, LazyCatalogTree, StatsPanel, SuggestionBox, show_rows
+
+# Built-in categories, used when no catalog file is given
+CATEGORIES = [
+    "Electronics/Phones",
+    "Electronics/Laptops",
+    "Clothing/Men's Wear",
+    "Clothing/Women's Wear",
+    "Groceries/Fruits",
+    "Groceries/Vegetables",
+]
 
 
 class VirtualShoppingAssistant:
-    def __init__(self, root):
+    def __init__(self, root, journal_path=None, catalog_path=None, sessions_path=None,
+                 session_memory=64 * 1024 * 1024, archive_path=None):
+        if journal_path and sessions_path:
+            raise ValueError("a journal keeps a single cart; session carts are kept in their own directory")
         self.root = root
         self.root.title("Virtual Shopping Assistant")
         self.root.geometry("800x600")
         self.root.config(bg="#f7f7f7")
 
-        #  deque
-        self.cart = deque()  # Using deque for LIFO processing
-        self.cart_history = []  
+        # Cart as a persistent stack
+        self.cart = LifoCart()  # Last in, first out, with O(1) snapshots
+        self.cart_history = self.cart.history  
+        self.catalog = CatalogFile.open(catalog_path) if catalog_path else Catalog.from_lines(CATEGORIES)
+        self.search_index = BackgroundSearchIndex(self.catalog.names)
+        self.copurchase = CoPurchaseIndex()  # Items bought together, for the selected tree item
+        self.journal = None  # Record of cart changes on disk, see open_journal
+        self.carts = None  # Carts of every session, see open_sessions
+        self.session = None
+        self.archive = None  # Every action on disk for analytics, see open_archive
 
         self.create_widgets()
+        if journal_path:
+            self.open_journal(journal_path)
+        if sessions_path:
+            self.open_sessions(sessions_path, session_memory)
+        if archive_path:
+            self.open_archive(archive_path)
 
     def create_widgets(self):
         # Treeview
@@ -22,23 +56,26 @@ class VirtualShoppingAssistant:
         self.tree.heading("#0", text="Categories and Items", anchor="w")
 
         
-        electronics = self.tree.insert("", "end", text="Electronics", open=True)
-        self.tree.insert(electronics, "end", text="Phones")
-        self.tree.insert(electronics, "end", text="Laptops")
-        clothing = self.tree.insert("", "end", text="Clothing", open=True)
-        self.tree.insert(clothing, "end", text="Men's Wear")
-        self.tree.insert(clothing, "end", text="Women's Wear")
-        groceries = self.tree.insert("", "end", text="Groceries", open=True)
-        self.tree.insert(groceries, "end", text="Fruits")
-        self.tree.insert(groceries, "end", text="Vegetables")
+        self.catalog_tree = LazyCatalogTree(self.tree, self.catalog, open_top_level=True)
 
         self.tree.pack(side="left", fill="y", padx=10, pady=10)
+        self.tree.bind("<<TreeviewSelect>>", self.show_copurchases)
 
         # Enter Item Section
         self.item_entry_label = tk.Label(self.root, text="Enter Item Name:")
         self.item_entry_label.pack(pady=5)
         self.item_entry = tk.Entry(self.root, width=40)
         self.item_entry.pack(pady=5)
+        self.suggestions = SuggestionBox(self.item_entry, self.suggest_items, self.choose_suggestion)
+
+        # Session selector, shown when carts are kept per session
+        self.session_frame = tk.Frame(self.root, bg="#f7f7f7")
+        self.session_label = tk.Label(self.session_frame, text="Session:", bg="#f7f7f7")
+        self.session_label.pack(side="left", padx=5)
+        self.session_entry = tk.Entry(self.session_frame, width=20)
+        self.session_entry.pack(side="left", padx=5)
+        self.session_button = tk.Button(self.session_frame, text="Switch Session", command=self.switch_session)
+        self.session_button.pack(side="left", padx=5)
 
         # Add/Process Buttons
         self.add_button = tk.Button(self.root, text="Add to Cart", command=self.add_to_cart)
@@ -48,8 +85,16 @@ class VirtualShoppingAssistant:
         self.process_button.pack(pady=5)
 
         # Cart
-        self.cart_display_label = tk.Label(self.root, text="Cart: Empty", bg="#f7f7f7", width=50)
+        self.cart_display_label = tk.Label(self.root, text="Cart: Empty", bg="#f7f7f7", width=50, wraplength=500)
         self.cart_display_label.pack(pady=10)
+        self.show_cart_button = tk.Button(self.root, text="Show Whole Cart", command=self.show_whole_cart)
+        self.show_cart_button.pack(pady=5)
+        self.copurchase_label = tk.Label(self.root, text="", bg="#f7f7f7", wraplength=500)
+        self.copurchase_label.pack(pady=5)
+        self.analytics_button = tk.Button(self.root, text="History Analytics",
+                                          command=lambda: self.archive.show_analytics())
+        self.history_button = tk.Button(self.root, text="Show Whole History",
+                                        command=lambda: self.archive.show_history())
 
         
         self.history_table = ttk.Treeview(self.root, columns=("No.", "Action", "Item"), show="headings", height=10)
@@ -58,39 +103,78 @@ class VirtualShoppingAssistant:
         self.history_table.heading("Item", text="Item")
         self.history_table.pack(pady=10)
 
+    @instrument.timed("topic5 update_cart_display", instrument.WIDGET, redraw=instrument.app_root)
     def update_cart_display(self):
         """
         Update the cart display dynamically based on current cart contents.
         """
-        if not self.cart:
-            self.cart_display_label.config(text="Cart: Empty")
-        else:
-            items = ", ".join(self.cart)
-            self.cart_display_label.config(text=f"Cart: {items}")
+        self.cart_display_label.config(text=self.cart.summary.text())
+
+    def show_whole_cart(self):
+        """
+        List every item in the cart, the next one to be processed last.
+        """
+        rows = list(self.cart)
+        show_rows(self.root, f"Cart ({len(rows)} items)", rows)
 
+    @instrument.timed("topic5 add_to_cart", instrument.ACTION)
     def add_to_cart(self):
         """
         Add an item to the cart. Updates cart and history.
         """
         item_name = self.get_selected_item_or_entry()
         if item_name:
-            self.cart.append(item_name)  # Add the item to the cart deque
-            self.cart_history.append(("Add", item_name))  # Log history
+            if self.journal:
+                try:
+                    self.journal.append(ADD, item_name)  # First, so a name it rejects changes nothing
+                except ValueError as error:
+                    self.show_warning(str(error))
+                    return
+            self.fetch_session_cart()
+            self.copurchase.add(item_name, reversed(self.cart.snapshot()))  # Before it joins the cart
+            self.cart.add(item_name)  # Push the item on the cart stack and log history
             self.update_cart_display()
-            self.history_table.insert("", "end", values=(len(self.cart_history), "Add", item_name))
+            self.history_table.insert("", "end", values=(self.cart.action_count, "Add", item_name))
+            self.archive_history()
 
+    @instrument.timed("topic5 process_order", instrument.ACTION)
     def process_order(self):
         """
         Process the most recently added item (LIFO order) and remove it from the cart.
         """
+        self.fetch_session_cart()
         if self.cart:
-            item_name = self.cart.pop()  # Remove the last item added to the cart
-            self.cart_history.append(("Process", item_name))  
+            item_name = self.cart.process()  # Remove the last item added to the cart and log it
+            if self.journal:
+                self.journal.append(PROCESS)
             self.update_cart_display()  # Update the cart display immediately
-            self.history_table.insert("", "end", values=(len(self.cart_history), "Process", item_name))
+            self.history_table.insert("", "end", values=(self.cart.action_count, "Process", item_name))
+            self.archive_history()
         else:
             self.show_warning("Cart is empty. No items to process.")
 
+    def show_copurchases(self, event=None):
+        """
+        Show what is often bought with the item selected in the tree.
+        """
+        selection = self.tree.selection()
+        item_name = selection and self.catalog_tree.item_name(selection[0])
+        self.copurchase_label.config(text=self.copurchase.text(item_name) if item_name else "")
+
+    def suggest_items(self, text):
+        """
+        Catalog entries matching the text typed so far, for the suggestion list.
+        """
+        return [(self.catalog.path(node), node) for node in self.search_index.suggest(text)]
+
+    def choose_suggestion(self, node):
+        """
+        Put the chosen catalog entry in the entry box and show it in the tree.
+        """
+        self.item_entry.delete(0, tk.END)
+        self.item_entry.insert(0, self.catalog.name(node))
+        self.catalog_tree.reveal(node)
+
     def get_selected_item_or_entry(self):
         """
         Retrieve the item name from the selected tree item or the entry box.
@@ -102,11 +186,97 @@ class VirtualShoppingAssistant:
             return item_name
         
         selected_item = self.tree.focus()
-        if selected_item:
-            return self.tree.item(selected_item, "text")
+        if selected_item and self.catalog_tree.item_name(selected_item):
+            return self.catalog_tree.item_name(selected_item)
         self.show_warning("No item selected or entered.")
         return None
 
+    def open_journal(self, path):
+        """
+        Rebuild the cart and its history from the journal and record every
+        change from now on.
+        """
+        self.journal = CartJournal(path)
+        self.journal.replay_into(self.cart)
+        self.copurchase.learn(self.cart_history)
+        for number, (action, item_name) in enumerate(self.cart_history, start=1):
+            self.history_table.insert("", "end", values=(number, action, item_name))
+        self.update_cart_display()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def open_sessions(self, path, memory_budget):
+        """
+        Keep a cart per session in the directory path, with idle carts
+        written to disk once those in memory take more than memory_budget bytes.
+        """
+        self.carts = SessionCartStore(path, memory_budget)
+        self.session_frame.pack(pady=5, before=self.item_entry_label)
+        self.session_entry.insert(0, "guest")
+        self.switch_session()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def fetch_session_cart(self):
+        """
+        Take the cart of the current session from the store before changing it,
+        in case the store wrote it to disk since.
+        """
+        if self.carts is not None:
+            self.cart = self.carts.get(self.session)
+            self.cart_history = self.cart.history
+
+    def switch_session(self):
+        """
+        Show the cart and history of the session named in the session box.
+        """
+        session = self.session_entry.get().strip()
+        if not session:
+            self.show_warning("Enter a session name.")
+            return
+        self.session = session
+        self.fetch_session_cart()
+        if self.archive is not None:
+            self.archive.follow(self.cart, self.cart.action_count)
+        self.history_table.delete(*self.history_table.get_children())
+        for number, (action, item_name) in enumerate(self.cart_history, start=self.cart.history_start + 1):
+            self.history_table.insert("", "end", values=(number, action, item_name))
+        self.update_cart_display()
+        self.root.title(f"Virtual Shopping Assistant - {session}")
+
+    def open_archive(self, path):
+        """
+        Append every action from now on to the history archive at path,
+        keeping only the last HISTORY_TAIL entries of the history in memory.
+        """
+        self.archive = ArchivedHistory(self.root, path, self.show_warning)
+        if self.carts is not None:
+            self.archive.follow(self.cart, self.cart.action_count)  # Session history is archived as it happens
+        else:
+            self.archive.follow(self.cart)
+        self.archive_history()
+        self.analytics_button.pack(pady=5, after=self.show_cart_button)
+        self.history_button.pack(pady=5, after=self.analytics_button)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def archive_history(self):
+        """
+        Copy the history entries added since the last call to the archive.
+        """
+        if self.archive is not None:
+            self.archive.sync(self.cart, self.history_table)
+            self.cart_history = self.cart.history
+
+    def close(self):
+        """
+        Save the journal, the session carts and the archive, whichever are open.
+        """
+        if self.journal:
+            self.journal.close(list(self.cart))
+        if self.carts is not None:
+            self.carts.flush()
+        if self.archive is not None:
+            self.archive.close()
+        self.root.destroy()
+
     def show_warning(self, message):
         """
         Display a warning popup with the given message.
@@ -121,6 +291,18 @@ class VirtualShoppingAssistant:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Virtual Shopping Assistant")
+    parser.add_argument("journal", nargs="?", help="file that keeps the cart between runs")
+    parser.add_argument("--catalog", help="category file, one path per line, e.g. Groceries/Fruits/Apples")
+    parser.add_argument("--sessions", help="directory that keeps a cart per session, instead of a journal")
+    parser.add_argument("--session-memory", type=int, default=64,
+                        help="megabytes of session carts to keep in memory before writing idle ones to disk")
+    parser.add_argument("--archive", help="history archive to append every action to, for History Analytics")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = VirtualShoppingAssistant(root)
+    app = VirtualShoppingAssistant(root, journal_path=args.journal, catalog_path=args.catalog,
+                                   sessions_path=args.sessions, session_memory=args.session_memory * 1024 * 1024,
+                                   archive_path=args.archive)
+    if instrument.ENABLED:
+        instrument_panel = StatsPanel(root)  # Live timings, see shopping_core/instrument.py
     root.mainloop()
@@ -1,21 +1,55 @@
+import argparse
+import time
 import tkinter as tk
 from tkinter import ttk
-from collections import deque
+from shopping_core import instrument
+from shopping_core.cart import LifoCart
+from shopping_core.catalog import Catalog, CatalogFile
+from shopping_core.copurchase import CoPurchaseIndex
+from shopping_core.journal import ADD, PROCESS, CartJournal
+from shopping_core.search import BackgroundSearchIndex
+from widgets import ArchivedHistory, LazyCatalogTree, StatsPanel, SuggestionBox, show_rows
+
+PROCESS_CHUNK = 500  # Items processed between trips back to the event loop
+
+# Built-in categories, used when no catalog file is given
+CATEGORIES = [
+    "Electronics/Phones",
+    "Electronics/Laptops",
+    "Clothing/Men's Wear/Shirts",
+    "Clothing/Men's Wear/Trousers",
+    "Clothing/Women's Wear/Dresses",
+    "Clothing/Women's Wear/Skirts",
+    "Groceries/Fruits/Apples",
+    "Groceries/Fruits/Bananas",
+    "Groceries/Vegetables/Carrots",
+    "Groceries/Vegetables/Broccoli",
+]
 
 
 class VirtualShoppingAssistant:
-    def __init__(self, root):
+    def __init__(self, root, journal_path=None, catalog_path=None, archive_path=None):
         self.root = root
         self.root.title("Virtual Shopping Assistant")
         self.root.geometry("900x600")
         self.root.config(bg="#f0f0f0")
 
-        # Initialize cart as a deque
-        self.cart = deque()  # Using deque for LIFO processing
-        self.cart_history = []  # Track history of actions
+        # Initialize cart as a persistent stack
+        self.cart = LifoCart()  # Last in, first out, with O(1) snapshots
+        self.cart_history = self.cart.history  # Track history of actions
+        self.journal = None  # Record of cart changes on disk, see open_journal
+        self.processing = None  # Progress of the running process_order, if any
+        self.archive = None  # Every action on disk for analytics, see open_archive
+        self.catalog = CatalogFile.open(catalog_path) if catalog_path else Catalog.from_lines(CATEGORIES)
+        self.search_index = BackgroundSearchIndex(self.catalog.names)
+        self.copurchase = CoPurchaseIndex()  # Items bought together, for the selected tree item
 
         self.style_widgets()
         self.create_widgets()
+        if journal_path:
+            self.open_journal(journal_path)
+        if archive_path:
+            self.open_archive(archive_path)
 
     def style_widgets(self):
         """
@@ -33,31 +67,17 @@ class VirtualShoppingAssistant:
         self.tree = ttk.Treeview(self.root)
         self.tree.heading("#0", text="Categories and Items", anchor="w")
 
-        # Populate TreeView with hierarchical data
-        electronics = self.tree.insert("", "end", text="Electronics", open=True)
-        self.tree.insert(electronics, "end", text="Phones")
-        self.tree.insert(electronics, "end", text="Laptops")
-        clothing = self.tree.insert("", "end", text="Clothing", open=True)
-        mens_wear = self.tree.insert(clothing, "end", text="Men's Wear")
-        womens_wear = self.tree.insert(clothing, "end", text="Women's Wear")
-        self.tree.insert(mens_wear, "end", text="Shirts")
-        self.tree.insert(mens_wear, "end", text="Trousers")
-        self.tree.insert(womens_wear, "end", text="Dresses")
-        self.tree.insert(womens_wear, "end", text="Skirts")
-        groceries = self.tree.insert("", "end", text="Groceries", open=True)
-        fruits = self.tree.insert(groceries, "end", text="Fruits")
-        vegetables = self.tree.insert(groceries, "end", text="Vegetables")
-        self.tree.insert(fruits, "end", text="Apples")
-        self.tree.insert(fruits, "end", text="Bananas")
-        self.tree.insert(vegetables, "end", text="Carrots")
-        self.tree.insert(vegetables, "end", text="Broccoli")
+        # Populate TreeView with hierarchical data, one level at a time as categories are opened
+        self.catalog_tree = LazyCatalogTree(self.tree, self.catalog, open_top_level=True)
 
         self.tree.pack(side="left", fill="y", padx=10, pady=10)
+        self.tree.bind("<<TreeviewSelect>>", self.show_copurchases)
 
         self.item_entry_label = ttk.Label(self.root, text="Enter Custom Item:")
         self.item_entry_label.pack(pady=5)
         self.item_entry = tk.Entry(self.root, width=30, font=("Helvetica", 12))
         self.item_entry.pack(pady=5)
+        self.suggestions = SuggestionBox(self.item_entry, self.suggest_items, self.choose_suggestion)
 
         # Add/Process Buttons
         self.add_button = ttk.Button(self.root, text="Add to Cart", command=self.add_to_cart)
@@ -66,9 +86,26 @@ class VirtualShoppingAssistant:
         self.process_button = ttk.Button(self.root, text="Process Order", command=self.process_order)
         self.process_button.pack(pady=5)
 
+        # Progress of a long Process Order, shown only while it runs
+        self.progress_frame = ttk.Frame(self.root)
+        self.progress_bar = ttk.Progressbar(self.progress_frame, length=300, mode="determinate")
+        self.progress_bar.pack(side="left", padx=5)
+        self.cancel_button = ttk.Button(self.progress_frame, text="Cancel", command=self.cancel_processing)
+        self.cancel_button.pack(side="left", padx=5)
+        self.progress_label = ttk.Label(self.root, text="")
+        self.progress_label.pack()
+
         
-        self.cart_display_label = ttk.Label(self.root, text="Cart: Empty", width=50)
+        self.cart_display_label = ttk.Label(self.root, text="Cart: Empty", width=50, wraplength=500)
         self.cart_display_label.pack(pady=10)
+        self.show_cart_button = ttk.Button(self.root, text="Show Whole Cart", command=self.show_whole_cart)
+        self.show_cart_button.pack(pady=5)
+        self.copurchase_label = ttk.Label(self.root, text="", wraplength=500)
+        self.copurchase_label.pack(pady=5)
+        self.analytics_button = ttk.Button(self.root, text="History Analytics",
+                                           command=lambda: self.archive.show_analytics())
+        self.history_button = ttk.Button(self.root, text="Show Whole History",
+                                         command=lambda: self.archive.show_history())
 
         
         self.history_table = ttk.Treeview(
@@ -82,16 +119,21 @@ class VirtualShoppingAssistant:
         self.history_table.column("Item", width=300, anchor="w")
         self.history_table.pack(pady=10)
 
+    @instrument.timed("topic6 update_cart_display", instrument.WIDGET, redraw=instrument.app_root)
     def update_cart_display(self):
         """
         Update the cart display dynamically based on current cart contents.
         """
-        if not self.cart:
-            self.cart_display_label.config(text="Cart: Empty")
-        else:
-            items = ", ".join(self.cart)
-            self.cart_display_label.config(text=f"Cart: {items}")
+        self.cart_display_label.config(text=self.cart.summary.text())
+
+    def show_whole_cart(self):
+        """
+        List every item in the cart, the next one to be processed last.
+        """
+        rows = list(self.cart)
+        show_rows(self.root, f"Cart ({len(rows)} items)", rows)
 
+    @instrument.timed("topic6 add_to_cart", instrument.ACTION)
     def add_to_cart(self):
         """
         Add an item to the cart. Updates cart and history.
@@ -100,33 +142,155 @@ class VirtualShoppingAssistant:
         selected_item = self.tree.focus()
 
         if custom_item:
-            self.cart.append(custom_item)
-            self.cart_history.append(("Add", custom_item))
-            self.update_cart_display()
-            self.history_table.insert("", "end", values=(len(self.cart_history), "Add", custom_item))
-            self.item_entry.delete(0, tk.END)  # Clear the input field
-        elif selected_item:
-            item_name = self.tree.item(selected_item, "text")
-            self.cart.append(item_name)
-            self.cart_history.append(("Add", item_name))
-            self.update_cart_display()
-            self.history_table.insert("", "end", values=(len(self.cart_history), "Add", item_name))
+            item_name = custom_item
+        elif selected_item and self.catalog_tree.item_name(selected_item):
+            item_name = self.catalog_tree.item_name(selected_item)
         else:
             self.show_warning("No item selected or entered. Please select an item or enter a custom item.")
+            return
+
+        if self.journal:
+            try:
+                self.journal.append(ADD, item_name)  # First, so a name it rejects changes nothing
+            except ValueError as error:
+                self.show_warning(str(error))
+                return
+        self.copurchase.add(item_name, reversed(self.cart.snapshot()))
+        self.cart.add(item_name)
+        self.update_cart_display()
+        self.history_table.insert("", "end", values=(self.cart.action_count, "Add", item_name))
+        if custom_item:
+            self.item_entry.delete(0, tk.END)  # Clear the input field
+        self.archive_history()
 
     def process_order(self):
         """
         Process all items in the cart and clear the cart.
+        Items are processed PROCESS_CHUNK at a time, going back to the event
+        loop between chunks so the window keeps redrawing and Cancel works.
+        Add and Process are disabled until it finishes, and only the items
+        in the cart when it started are processed.
         """
+        if self.processing:
+            return
         if self.cart:
-            while self.cart:  
-                item_name = self.cart.pop()
-                self.cart_history.append(("Process", item_name))
-                self.history_table.insert("", "end", values=(len(self.cart_history), "Process", item_name))
-            self.update_cart_display()  
+            self.processing = {"total": len(self.cart), "done": 0, "cancelled": False,
+                               "started": time.perf_counter(), "first_paint": None}
+            for button in (self.add_button, self.process_button):
+                button.state(["disabled"])
+            self.progress_bar.config(maximum=len(self.cart), value=0)
+            self.progress_frame.pack(pady=5, after=self.process_button)
+            self.root.after(1, self.process_chunk)
         else:
             self.show_warning("Cart is empty. No items to process.")
 
+    @instrument.timed("topic6 process_chunk", instrument.ACTION)
+    def process_chunk(self):
+        progress = self.processing
+        if progress["cancelled"] or not self.cart or progress["done"] >= progress["total"]:
+            self.finish_processing()
+            return
+        first_number = self.cart.action_count + 1
+        processed = self.cart.process_many(min(PROCESS_CHUNK, progress["total"] - progress["done"]))
+        if self.journal:
+            for _ in processed:
+                self.journal.append(PROCESS)
+        for number, item_name in enumerate(processed, start=first_number):
+            self.history_table.insert("", "end", values=(number, "Process", item_name))
+        self.archive_history()
+        progress["done"] += len(processed)
+        self.progress_bar.config(value=progress["done"])
+        self.progress_label.config(text=f"Processed {progress['done']} of {progress['total']} items")
+        if progress["first_paint"] is None:
+            self.root.update_idletasks()  # Draw the first rows before timing them
+            progress["first_paint"] = time.perf_counter() - progress["started"]
+        self.root.after(1, self.process_chunk)
+
+    def cancel_processing(self):
+        """
+        Stop after the current chunk; unprocessed items stay in the cart.
+        """
+        if self.processing:
+            self.processing["cancelled"] = True
+
+    def finish_processing(self):
+        progress, self.processing = self.processing, None
+        self.progress_frame.pack_forget()
+        for button in (self.add_button, self.process_button):
+            button.state(["!disabled"])
+        total = time.perf_counter() - progress["started"]
+        stopped = "Cancelled after" if progress["cancelled"] else "Processed"
+        summary = f"{stopped} {progress['done']} items in {total:.2f} s"
+        if progress["first_paint"] is not None:
+            summary += f" (first rows after {progress['first_paint'] * 1000:.0f} ms)"
+        self.progress_label.config(text=summary)
+        self.update_cart_display()
+
+    def show_copurchases(self, event=None):
+        """
+        Show what is often bought with the item selected in the tree.
+        """
+        selection = self.tree.selection()
+        item_name = selection and self.catalog_tree.item_name(selection[0])
+        self.copurchase_label.config(text=self.copurchase.text(item_name) if item_name else "")
+
+    def suggest_items(self, text):
+        """
+        Catalog entries matching the text typed so far, for the suggestion list.
+        """
+        return [(self.catalog.path(node), node) for node in self.search_index.suggest(text)]
+
+    def choose_suggestion(self, node):
+        """
+        Put the chosen catalog entry in the entry box and show it in the tree.
+        """
+        self.item_entry.delete(0, tk.END)
+        self.item_entry.insert(0, self.catalog.name(node))
+        self.catalog_tree.reveal(node)
+
+    def open_journal(self, path):
+        """
+        Rebuild the cart and its history from the journal and record every
+        change from now on.
+        """
+        self.journal = CartJournal(path)
+        self.journal.replay_into(self.cart)
+        self.copurchase.learn(self.cart_history)
+        for number, (action, item_name) in enumerate(self.cart_history, start=1):
+            self.history_table.insert("", "end", values=(number, action, item_name))
+        self.update_cart_display()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def open_archive(self, path):
+        """
+        Append every action from now on to the history archive at path,
+        keeping only the last HISTORY_TAIL entries of the history in memory.
+        """
+        self.archive = ArchivedHistory(self.root, path, self.show_warning)
+        self.archive.follow(self.cart)
+        self.archive_history()
+        self.analytics_button.pack(pady=5, after=self.show_cart_button)
+        self.history_button.pack(pady=5, after=self.analytics_button)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def archive_history(self):
+        """
+        Copy the history entries added since the last call to the archive.
+        """
+        if self.archive is not None:
+            self.archive.sync(self.cart, self.history_table)
+            self.cart_history = self.cart.history
+
+    def close(self):
+        """
+        Save the journal and the archive, whichever are open.
+        """
+        if self.journal:
+            self.journal.close(list(self.cart))
+        if self.archive is not None:
+            self.archive.close()
+        self.root.destroy()
+
     def show_warning(self, message):
         """
         Display a warning popup with the given message.
@@ -141,6 +305,14 @@ class VirtualShoppingAssistant:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Virtual Shopping Assistant")
+    parser.add_argument("journal", nargs="?", help="file that keeps the cart between runs")
+    parser.add_argument("--catalog", help="category file, one path per line, e.g. Groceries/Fruits/Apples")
+    parser.add_argument("--archive", help="history archive to append every action to, for History Analytics")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = VirtualShoppingAssistant(root)
+    app = VirtualShoppingAssistant(root, journal_path=args.journal, catalog_path=args.catalog,
+                                   archive_path=args.archive)
+    if instrument.ENABLED:
+        instrument_panel = StatsPanel(root)  # Live timings, see shopping_core/instrument.py
     root.mainloop()
@@ -1,19 +1,14 @@
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import font
+from shopping_core import instrument
+from shopping_core.priority_sort import SortedProductList, page, priority_band, sort_by_priority, top_k
+from widgets import StatsPanel, VirtualListbox
 
-# Insertion Sort Function
-def insertion_sort(data):
-    for i in range(1, len(data)):
-        current_item = data[i]
-        j = i - 1
-        while j >= 0 and data[j]['priority'] > current_item['priority']:
-            data[j + 1] = data[j]
-            j -= 1
-        data[j + 1] = current_item
-    return data
+PAGE_SIZE = 50  # Products per page for Previous/Next Page
 
 # Add Product to the List
+@instrument.timed("topic7 add_product", instrument.ACTION)
 def add_product():
     product_name = selected_product.get()
     priority = entry_priority.get()
@@ -21,85 +16,181 @@ def add_product():
         messagebox.showerror("Input Error", "Please select a valid product and enter a valid priority (numeric).")
         return
     priority = int(priority)
-    products_list.append({"product": product_name, "priority": priority})
-    update_product_list()
+    product = {"product": product_name, "priority": priority}
+    if keep_sorted.get():
+        products_list.add(product)  # Lands in priority order, no re-sort needed
+    else:
+        products_list.append(product)
+        if query_results is None:
+            listbox.insert_rows(len(products_list) - 1)
+            return
+    show_all()
 
 # Update Listbox to display products
+@instrument.timed("topic7 update_product_list", instrument.WIDGET)
 def update_product_list():
-    listbox.delete(0, tk.END)
-    for product in products_list:
-        listbox.insert(tk.END, f"{product['product']} - Priority: {product['priority']}")
+    listbox.set_count(len(shown_products()))  # Only the visible rows are redrawn
+
+# The whole list, or the results of the last query
+def shown_products():
+    return products_list if query_results is None else query_results
+
+# Text for one row of the Listbox, built when the row scrolls into view
+def product_row_text(index):
+    product = shown_products()[index]
+    return f"{product['product']} - Priority: {product['priority']}"
+
+# Show query results instead of the whole list
+def show_results(results, title):
+    global query_results
+    query_results = results
+    title_label.config(text=title)
+    listbox.scroll_to(0)
+    update_product_list()
+
+def show_all():
+    global query_results, page_offset
+    query_results = None
+    page_offset = 0
+    title_label.config(text="Product List")
+    update_product_list()
+
+# The first few products in priority order, without sorting the whole list
+def show_top():
+    count = entry_top.get().strip()
+    if not count.isdigit():
+        messagebox.showerror("Input Error", "Please enter how many products to show (numeric).")
+        return
+    show_results(top_k(products_list, int(count)), f"Top {count} Products")
+
+def show_page(step):
+    global page_offset
+    page_offset = max(0, min(page_offset + step * PAGE_SIZE, (len(products_list) - 1) // PAGE_SIZE * PAGE_SIZE))
+    results = page(products_list, page_offset, PAGE_SIZE)
+    show_results(results, f"Products {page_offset + 1}-{page_offset + len(results)} by Priority")
+
+def show_band():
+    low, high = entry_band_low.get().strip(), entry_band_high.get().strip()
+    if not low.isdigit() or not high.isdigit():
+        messagebox.showerror("Input Error", "Please enter both ends of the priority band (numeric).")
+        return
+    show_results(priority_band(products_list, int(low), int(high)), f"Priority {low} to {high}")
 
 # Sort Products
 def sort_products():
     global products_list
-    sorted_products = insertion_sort(products_list)
-    update_product_list()
+    if not keep_sorted.get():  # A kept-sorted list is already in order
+        sort_by_priority(products_list)
+    show_all()
     messagebox.showinfo("Sort Complete", "Products have been sorted by priority.")
 
-# GUI Setup
-root = tk.Tk()
-root.title("Shopping Assistant - Product Priority Sorting")
-
-# Maximize the window to fit the screen, without hiding the window controls
-root.state('zoomed')  # This will maximize the window without hiding controls
-
-# Set the background color for the window
-root.configure(bg='#f4f4f9')
-
-# Create a list to store products
-products_list = []
-
-# Fonts
-header_font = font.Font(family="Helvetica", size=16, weight="bold")
-label_font = font.Font(family="Arial", size=12)
-entry_font = font.Font(family="Verdana", size=10)
-button_font = font.Font(family="Arial", size=12, weight="bold")
-
-# List of 10 basic products in Rwanda
-product_options = [
-    "Rice", "Beans", "Maize flour", "Sugar", "Salt", 
-    "Cooking oil", "Milk", "Tea", "Soap", "Water"
-]
-
-# Create and place widgets
-frame = tk.Frame(root, bg="#f4f4f9")
-frame.pack(padx=20, pady=20)
-
-# Product Name Label and OptionMenu
-label_name = tk.Label(frame, text="Select Product:", font=label_font, bg="#f4f4f9")
-label_name.grid(row=0, column=0, padx=10, pady=5, sticky='e')
-
-# OptionMenu for product selection
-selected_product = tk.StringVar()
-selected_product.set(product_options[0])  # Default value
-
-product_menu = tk.OptionMenu(frame, selected_product, *product_options)
-product_menu.config(font=entry_font, width=30)
-product_menu.grid(row=0, column=1, padx=10, pady=5)
-
-# Product Priority Label and Entry
-label_priority = tk.Label(frame, text="Priority (Numeric):", font=label_font, bg="#f4f4f9")
-label_priority.grid(row=1, column=0, padx=10, pady=5, sticky='e')
-
-entry_priority = tk.Entry(frame, font=entry_font, width=30)
-entry_priority.grid(row=1, column=1, padx=10, pady=5)
-
-# Add Product Button
-button_add = tk.Button(frame, text="Add Product", font=button_font, bg="#4CAF50", fg="white", relief="flat", command=add_product)
-button_add.grid(row=2, column=0, columnspan=2, pady=10, ipady=5)
-
-# Sort Products Button
-button_sort = tk.Button(frame, text="Sort by Priority", font=button_font, bg="#2196F3", fg="white", relief="flat", command=sort_products)
-button_sort.grid(row=3, column=0, columnspan=2, pady=10, ipady=5)
-
-# Title Label
-title_label = tk.Label(root, text="Product List", font=header_font, bg="#f4f4f9", fg="#333")
-title_label.pack(pady=10)
-
-# Listbox to display products
-listbox = tk.Listbox(root, font=entry_font, width=50, height=10, bg="#ffffff", fg="#333", selectbackground="#ffcc00", selectforeground="black")
-listbox.pack(padx=20, pady=10)
+# Switch between a plain list and one that stays sorted as products are added
+def toggle_keep_sorted():
+    global products_list
+    if keep_sorted.get():
+        products_list = SortedProductList(products_list)
+    else:
+        products_list = list(products_list)
+    update_product_list()
 
-# Start the GUI loop
-root.mainloop()
+if __name__ == "__main__":
+    # GUI Setup
+    root = tk.Tk()
+    root.title("Shopping Assistant - Product Priority Sorting")
+
+    # Maximize the window to fit the screen, without hiding the window controls
+    root.state('zoomed')  # This will maximize the window without hiding controls
+
+    # Set the background color for the window
+    root.configure(bg='#f4f4f9')
+
+    # Create a list to store products
+    products_list = []
+    query_results = None  # Products shown instead of the whole list, see show_results
+    page_offset = 0
+
+    # Fonts
+    header_font = font.Font(family="Helvetica", size=16, weight="bold")
+    label_font = font.Font(family="Arial", size=12)
+    entry_font = font.Font(family="Verdana", size=10)
+    button_font = font.Font(family="Arial", size=12, weight="bold")
+
+    # List of 10 basic products in Rwanda
+    product_options = [
+        "Rice", "Beans", "Maize flour", "Sugar", "Salt", 
+        "Cooking oil", "Milk", "Tea", "Soap", "Water"
+    ]
+
+    # Create and place widgets
+    frame = tk.Frame(root, bg="#f4f4f9")
+    frame.pack(padx=20, pady=20)
+
+    # Product Name Label and OptionMenu
+    label_name = tk.Label(frame, text="Select Product:", font=label_font, bg="#f4f4f9")
+    label_name.grid(row=0, column=0, padx=10, pady=5, sticky='e')
+
+    # OptionMenu for product selection
+    selected_product = tk.StringVar()
+    selected_product.set(product_options[0])  # Default value
+
+    product_menu = tk.OptionMenu(frame, selected_product, *product_options)
+    product_menu.config(font=entry_font, width=30)
+    product_menu.grid(row=0, column=1, padx=10, pady=5)
+
+    # Product Priority Label and Entry
+    label_priority = tk.Label(frame, text="Priority (Numeric):", font=label_font, bg="#f4f4f9")
+    label_priority.grid(row=1, column=0, padx=10, pady=5, sticky='e')
+
+    entry_priority = tk.Entry(frame, font=entry_font, width=30)
+    entry_priority.grid(row=1, column=1, padx=10, pady=5)
+
+    # Add Product Button
+    button_add = tk.Button(frame, text="Add Product", font=button_font, bg="#4CAF50", fg="white", relief="flat", command=add_product)
+    button_add.grid(row=2, column=0, columnspan=2, pady=10, ipady=5)
+
+    # Sort Products Button
+    button_sort = tk.Button(frame, text="Sort by Priority", font=button_font, bg="#2196F3", fg="white", relief="flat", command=sort_products)
+    button_sort.grid(row=3, column=0, columnspan=2, pady=10, ipady=5)
+
+    # Keep Sorted Checkbutton
+    keep_sorted = tk.BooleanVar(value=False)
+    check_keep_sorted = tk.Checkbutton(frame, text="Keep sorted while adding", font=label_font, bg="#f4f4f9", variable=keep_sorted, command=toggle_keep_sorted)
+    check_keep_sorted.grid(row=4, column=0, columnspan=2, pady=5)
+
+    # Queries that only look at the first products in priority order
+    query_frame = tk.Frame(frame, bg="#f4f4f9")
+    query_frame.grid(row=5, column=0, columnspan=2, pady=5)
+
+    entry_top = tk.Entry(query_frame, font=entry_font, width=6)
+    entry_top.insert(0, "50")
+    entry_top.grid(row=0, column=0, padx=5, pady=2)
+    button_top = tk.Button(query_frame, text="Show Top", font=label_font, command=show_top)
+    button_top.grid(row=0, column=1, padx=5, pady=2, sticky='we')
+
+    button_previous = tk.Button(query_frame, text="Previous Page", font=label_font, command=lambda: show_page(-1))
+    button_previous.grid(row=0, column=2, padx=5, pady=2)
+    button_next = tk.Button(query_frame, text="Next Page", font=label_font, command=lambda: show_page(1))
+    button_next.grid(row=0, column=3, padx=5, pady=2)
+
+    entry_band_low = tk.Entry(query_frame, font=entry_font, width=6)
+    entry_band_low.grid(row=1, column=0, padx=5, pady=2)
+    entry_band_high = tk.Entry(query_frame, font=entry_font, width=6)
+    entry_band_high.grid(row=1, column=1, padx=5, pady=2)
+    button_band = tk.Button(query_frame, text="Show Priority Band", font=label_font, command=show_band)
+    button_band.grid(row=1, column=2, padx=5, pady=2)
+    button_all = tk.Button(query_frame, text="Show All", font=label_font, command=show_all)
+    button_all.grid(row=1, column=3, padx=5, pady=2)
+
+    # Title Label
+    title_label = tk.Label(root, text="Product List", font=header_font, bg="#f4f4f9", fg="#333")
+    title_label.pack(pady=10)
+
+    # Listbox to display products
+    listbox = VirtualListbox(root, product_row_text, font=entry_font, width=50, height=10, bg="#ffffff", fg="#333", selectbackground="#ffcc00", selectforeground="black")
+    listbox.pack(padx=20, pady=10)
+
+    if instrument.ENABLED:
+        instrument_panel = StatsPanel(root)  # Live timings, see shopping_core/instrument.py
+
+    # Start the GUI loop
+    root.mainloop()
@@ -0,0 +1,366 @@
+"""
+Reusable Tk widgets shared by the shopping assistant apps.
+"""
+import time
+import tkinter as tk
+from tkinter import filedialog
+from tkinter import ttk
+
+from shopping_core import instrument
+from shopping_core.archive import HistoryArchive
+
+HISTORY_TAIL = 1_000  # History entries kept in memory and in the history table once archived
+
+
+class VirtualListbox(tk.Frame):
+    """
+    A Listbox that only holds the rows currently on screen.
+    The rows themselves live in the app's own data structure; row_text(index)
+    is called to build the text of a row when it scrolls into view, so an
+    update costs at most `height` Listbox calls however many rows there are.
+    """
+    def __init__(self, master, row_text, height=10, **listbox_options):
+        super().__init__(master, bg=listbox_options.get("bg"))
+        self.row_text = row_text
+        self.row_count = 0
+        self.top = 0  # Index of the first visible row
+        self.height = height
+
+        self.listbox = tk.Listbox(self, height=height, **listbox_options)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.listbox.bind("<MouseWheel>", lambda event: self.scroll_to(self.top - event.delta // 120))
+        self.listbox.bind("<Button-4>", lambda event: self.scroll_to(self.top - 1))
+        self.listbox.bind("<Button-5>", lambda event: self.scroll_to(self.top + 1))
+
+    def set_count(self, count):
+        """
+        Replace the row count and redraw the visible rows.
+        """
+        self.row_count = count
+        self.scroll_to(self.top)
+
+    def insert_rows(self, index, count=1):
+        """
+        Rows were inserted into the data at index. Rows above the window move
+        the window down so the same rows stay on screen; rows below it only
+        change the scrollbar.
+        """
+        self.row_count += count
+        if index < self.top:
+            self.top += count
+        elif index < self.top + self.height:
+            self.render()
+            return
+        self.update_scrollbar()
+
+    def delete_rows(self, index, count=1):
+        """
+        Rows were removed from the data at index.
+        """
+        self.row_count -= count
+        if index + count <= self.top:
+            self.top -= count
+            self.update_scrollbar()
+        elif index < self.top + self.height:
+            self.scroll_to(min(self.top, index))
+        else:
+            self.update_scrollbar()
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, self.row_count - self.height))
+        self.render()
+
+    @instrument.timed("VirtualListbox render", instrument.WIDGET)
+    def render(self):
+        self.listbox.delete(0, tk.END)
+        end = min(self.top + self.height, self.row_count)
+        for index in range(self.top, end):
+            self.listbox.insert(tk.END, self.row_text(index))
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        if self.row_count <= self.height:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / self.row_count, (self.top + self.height) / self.row_count)
+
+    def yview(self, *args):
+        """
+        Scrollbar callback: ("moveto", fraction) or ("scroll", n, "units"/"pages").
+        """
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.row_count))
+        elif args[0] == "scroll":
+            step = self.height if args[2] == "pages" else 1
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def curselection(self):
+        """
+        Indexes of the selected rows in the data, not in the Listbox.
+        """
+        return tuple(self.top + i for i in self.listbox.curselection())
+
+
+class LazyCatalogTree:
+    """
+    Fills a ttk.Treeview from a shopping_core.catalog.Catalog or CatalogFile
+    one level at a time. A category gets a single placeholder child so it shows an expander;
+    its real children are inserted the first time it is opened, so the
+    Treeview only ever holds the branches the user has looked at.
+    """
+    PLACEHOLDER = "Loading..."
+
+    def __init__(self, tree, catalog, open_top_level=False):
+        self.tree = tree
+        self.catalog = catalog
+        self.nodes = {}  # Treeview item ID -> catalog node, for categories not yet opened
+        self.items = {}  # Catalog node -> Treeview item ID, for every node inserted so far
+        tree.bind("<<TreeviewOpen>>", lambda event: self.expand(tree.focus()))
+        self.insert_children("", catalog.ROOT)
+        if open_top_level:
+            for item in tree.get_children(""):
+                self.expand(item)
+                tree.item(item, open=True)
+
+    def insert_children(self, parent, node):
+        for child in self.catalog.children(node):
+            item = self.tree.insert(parent, "end", text=self.catalog.name(child))
+            self.items[child] = item
+            if self.catalog.has_children(child):
+                self.tree.insert(item, "end", text=self.PLACEHOLDER, tags=("placeholder",))
+                self.nodes[item] = child
+
+    def expand(self, item):
+        node = self.nodes.pop(item, None)
+        if node is None:
+            return  # A leaf, or a category that is already filled in
+        self.tree.delete(*self.tree.get_children(item))
+        self.insert_children(item, node)
+
+    def reveal(self, node):
+        """
+        Open the categories above a catalog node, then select and show it.
+        """
+        ancestors = []
+        parent = self.catalog.parent(node)
+        while parent != self.catalog.ROOT:
+            ancestors.append(parent)
+            parent = self.catalog.parent(parent)
+        for ancestor in reversed(ancestors):
+            item = self.items[ancestor]
+            self.expand(item)
+            self.tree.item(item, open=True)
+        item = self.items[node]
+        self.tree.selection_set(item)
+        self.tree.focus(item)
+        self.tree.see(item)
+
+    def item_name(self, item):
+        """
+        Text of a Treeview item, or None for a placeholder row.
+        """
+        if "placeholder" in self.tree.item(item, "tags"):
+            return None
+        return self.tree.item(item, "text")
+
+
+class SuggestionBox:
+    """
+    A drop-down list of suggestions under an Entry, updated as the user types.
+    suggest(text) returns [(label, value), ...]; choosing a row calls
+    on_choose(value). Typing only restarts a `delay` ms timer, so a burst of
+    keystrokes runs a single search once the user pauses.
+    """
+    def __init__(self, entry, suggest, on_choose, delay=150, height=8):
+        self.entry = entry
+        self.suggest = suggest
+        self.on_choose = on_choose
+        self.delay = delay
+        self.pending = None  # after() ID of the scheduled search
+        self.values = []
+        self.listbox = tk.Listbox(entry.winfo_toplevel(), height=height)
+
+        entry.bind("<KeyRelease>", self.on_key, add="+")
+        entry.bind("<Down>", lambda event: self.focus_list(), add="+")
+        entry.bind("<Escape>", lambda event: self.hide(), add="+")
+        entry.bind("<FocusOut>", lambda event: entry.after(200, self.hide_unless_focused), add="+")
+        self.listbox.bind("<ButtonRelease-1>", lambda event: self.choose())
+        self.listbox.bind("<Return>", lambda event: self.choose())
+        self.listbox.bind("<Escape>", lambda event: self.hide())
+
+    def on_key(self, event):
+        if event.keysym in ("Down", "Up", "Return", "Escape", "Tab"):
+            return
+        if self.pending:
+            self.entry.after_cancel(self.pending)
+        self.pending = self.entry.after(self.delay, self.refresh)
+
+    def refresh(self):
+        self.pending = None
+        suggestions = self.suggest(self.entry.get())
+        self.values = [value for _, value in suggestions]
+        self.listbox.delete(0, tk.END)
+        for label, _ in suggestions:
+            self.listbox.insert(tk.END, label)
+        if suggestions:
+            self.listbox.place(in_=self.entry, relx=0, rely=1, relwidth=1, y=2)
+            self.listbox.lift()
+        else:
+            self.hide()
+
+    def focus_list(self):
+        if self.values:
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+
+    def choose(self):
+        selection = self.listbox.curselection()
+        if selection:
+            value = self.values[selection[0]]
+            self.hide()
+            self.entry.focus_set()
+            self.on_choose(value)
+
+    def hide_unless_focused(self):
+        if self.entry.focus_get() is not self.listbox:
+            self.hide()
+
+    def hide(self):
+        self.listbox.place_forget()
+
+
+def show_rows(master, title, rows, height=20):
+    """
+    Open a window listing rows, a list of strings, in a VirtualListbox.
+    """
+    window = tk.Toplevel(master)
+    window.title(title)
+    listbox = VirtualListbox(window, rows.__getitem__, height=height, width=60)
+    listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+    listbox.set_count(len(rows))
+    return window
+
+
+class ArchiveRows:
+    """
+    The rows of a HistoryArchive as numbered text lines for show_rows(),
+    read from the archive as they scroll into view.
+    """
+    def __init__(self, archive):
+        self.archive = archive
+
+    def __len__(self):
+        return len(self.archive)
+
+    def __getitem__(self, index):
+        action, item = self.archive.entry(index)
+        return f"{index + 1}. {action} {item}"
+
+
+class ArchivedHistory:
+    """
+    Keeps the cart history of topic5.py and topic6.py in a HistoryArchive.
+    sync() copies the entries added since the last call to the archive and
+    then trims the cart's history, and the history table if given, to the
+    last `tail` entries; the whole history and its analytics are read back
+    from the archive. warn(message) reports errors to the user.
+    """
+    def __init__(self, master, path, warn, tail=HISTORY_TAIL):
+        self.master = master
+        self.archive = HistoryArchive(path)
+        self.warn = warn
+        self.tail = tail
+        self.archived = 0  # Actions of the cart, counted by cart.action_count, already in the archive
+
+    def __len__(self):
+        return len(self.archive)
+
+    def follow(self, cart, archived=None):
+        """
+        Archive the actions of cart after its first `archived` ones; by
+        default those the archive has no row for yet, such as actions a
+        journal replayed that never reached the archive before a crash.
+        """
+        self.archived = min(cart.action_count, len(self.archive)) if archived is None else archived
+
+    def sync(self, cart, table=None):
+        self.archive.extend(cart.history[self.archived - cart.history_start:])
+        self.archived = cart.action_count
+        cart.trim_history(self.tail)
+        if table is not None:
+            rows = table.get_children()
+            if len(rows) > self.tail:
+                table.delete(*rows[:len(rows) - self.tail])
+
+    def show_history(self):
+        show_rows(self.master, f"Whole History ({len(self.archive)} actions)", ArchiveRows(self.archive))
+
+    def show_analytics(self):
+        """
+        Totals, most added items and recent processing rate from the archive.
+        """
+        try:
+            actions = self.archive.action_counts()
+            top = self.archive.top_items(10)
+            ratios = self.archive.add_process_ratios()
+            starts, counts = self.archive.process_rate(60)
+        except ImportError as error:
+            self.warn(str(error))
+            return
+        rows = [f"{actions['Add']} added, {actions['Process']} processed", "", "Most added:"]
+        rows += [f"  {item}: {count} added, add/process ratio {ratios[item]:.2f}" for item, count in top]
+        rows += ["", "Processed per minute, last 10 minutes:"]
+        rows += [f"  {time.strftime('%Y-%m-%d %H:%M', time.localtime(start / 1e9))}: {count}"
+                 for start, count in zip(starts[-10:].tolist(), counts[-10:].tolist())]
+        show_rows(self.master, f"History Analytics ({len(self.archive)} actions)", rows)
+
+    def close(self):
+        self.archive.close()
+
+
+class StatsPanel(tk.Toplevel):
+    """
+    Live table of the operations timed by shopping_core.instrument, refreshed
+    every `interval` ms. Only shows anything with SHOPPING_PROFILE set.
+    """
+    COLUMNS = ("Operation", "Kind", "Calls", "Mean (us)", "p50 (us)", "p99 (us)", "Max (us)")
+
+    def __init__(self, master, interval=1000):
+        super().__init__(master)
+        self.title("Operation Timings")
+        self.interval = interval
+        self.rows = {}  # Operation name -> table row
+
+        self.table = ttk.Treeview(self, columns=self.COLUMNS, show="headings", height=15)
+        for column in self.COLUMNS:
+            self.table.heading(column, text=column)
+            self.table.column(column, width=220 if column == "Operation" else 80,
+                              anchor="w" if column in ("Operation", "Kind") else "e")
+        self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.totals_label = tk.Label(self, anchor="w")
+        self.totals_label.pack(fill=tk.X, padx=10)
+        self.save_button = tk.Button(self, text="Save as JSON", command=self.save)
+        self.save_button.pack(pady=5)
+        self.refresh()
+
+    def refresh(self):
+        for name, stats in instrument.snapshot().items():
+            values = (name, stats["kind"], stats["count"], f"{stats['mean_us']:.1f}",
+                      stats["p50_us"], stats["p99_us"], f"{stats['max_us']:.0f}")
+            if name in self.rows:
+                self.table.item(self.rows[name], values=values)
+            else:
+                self.rows[name] = self.table.insert("", "end", values=values)
+        totals = instrument.totals_by_kind()
+        self.totals_label.config(text="Total ms: " + ", ".join(f"{kind} {ms:.1f}" for kind, ms in sorted(totals.items())))
+        self.after(self.interval, self.refresh)
+
+    def save(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json")
+        if path:
+            instrument.dump(path)